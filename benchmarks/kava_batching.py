@@ -0,0 +1,111 @@
+"""
+Measure the request throughput of the Kava client against a local echo server, with and without batching.
+
+Usage, from the root of the repository:
+    python benchmarks/kava_batching.py
+    python benchmarks/kava_batching.py --batch
+"""
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+
+import websockets
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lava.krabbe.client import KavaClient  # skipcq: FLK-E402
+
+REQUESTS = 20000
+CONCURRENCY = 500
+PORT = 8790
+
+BATCH = "--batch" in sys.argv
+
+
+class Bot:
+    """
+    The parts of the bot the client uses.
+    """
+    logger = logging.getLogger("benchmark")
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+
+
+async def serve(websocket) -> None:
+    """
+    Answer every request right away, batching the responses within 1ms if the client asked for batching.
+    """
+    hello = json.loads(await websocket.recv())
+    batching = BATCH and hello.get("batching", False)
+
+    await websocket.send(json.dumps({"type": "hello", "codec": "json", "batching": batching}))
+
+    outbox = []
+
+    async def flush() -> None:
+        while True:
+            await asyncio.sleep(0.001)
+
+            if outbox:
+                batch = outbox[:]
+                outbox.clear()
+
+                await websocket.send(json.dumps(batch if len(batch) > 1 else batch[0]))
+
+    flusher = asyncio.get_running_loop().create_task(flush()) if batching else None
+
+    try:
+        async for message in websocket:
+            data = json.loads(message)
+
+            for request in data if isinstance(data, list) else [data]:
+                response = {"type": "response", "id": request["id"], "data": {"status": "success"}}
+
+                if batching:
+                    outbox.append(response)
+                else:
+                    await websocket.send(json.dumps(response))
+    finally:
+        if flusher:
+            flusher.cancel()
+
+
+async def main() -> None:
+    logging.basicConfig(level=logging.WARNING)
+
+    loop = asyncio.get_running_loop()
+
+    async with websockets.serve(serve, "127.0.0.1", PORT):
+        options = {"batch_window": 0.002, "batch_size": 64} if BATCH else {}
+
+        client = KavaClient(Bot(loop), f"ws://127.0.0.1:{PORT}", **options)
+
+        await client.connect()
+        await client.request("warmup")
+
+        semaphore = asyncio.Semaphore(CONCURRENCY)
+
+        async def request(index: int) -> None:
+            async with semaphore:
+                await client.request("benchmark", index=index)
+
+        start = time.perf_counter()
+
+        await asyncio.gather(*(request(index) for index in range(REQUESTS)))
+
+        elapsed = time.perf_counter() - start
+
+        print(
+            f"{'batched' if BATCH else 'unbatched'}: {REQUESTS / elapsed:.0f} requests/s "
+            f"({2 * REQUESTS / elapsed:.0f} messages/s), {REQUESTS} requests with {CONCURRENCY} in flight"
+        )
+
+        await client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,62 @@
+"""
+Measure how long creating the SourceManager takes, and how long routing a query to the source handling it takes.
+Also runs on trees predating the host index, where every source is created up front and checked in turn, so the
+two can be compared by running it before and after that change.
+
+Usage, from the root of the repository:
+    python benchmarks/source_routing.py
+"""
+import os
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Dummy credentials, no request is made
+os.environ.setdefault("SPOTIFY_CLIENT_ID", "benchmark")
+os.environ.setdefault("SPOTIFY_CLIENT_SECRET", "benchmark")
+os.environ.setdefault("SPOTIFY_RESOLUTION_CACHE_PATH", "")
+
+from lava.source import SourceManager  # skipcq: FLK-E402
+
+QUERIES = (
+    "https://open.spotify.com/track/4uLU6hMCjMI75M1A2tKUQC",
+    "https://soundcloud.com/artist/track",
+    "https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+    "never gonna give you up"
+)
+
+NUMBER = 200000
+
+
+def main() -> None:
+    start = time.perf_counter()
+
+    manager = SourceManager()
+
+    print(f"SourceManager(): {(time.perf_counter() - start) * 1000:.2f}ms")
+
+    if hasattr(manager, "route"):
+        def route(query: str) -> str:
+            for cls in manager.route(query):
+                if cls.check_query(query):
+                    return cls.__name__
+
+            return "None"
+    else:
+        def route(query: str) -> str:
+            for source in manager.sources:
+                if source.check_query(query):
+                    return type(source).__name__
+
+            return "None"
+
+    for query in QUERIES:
+        elapsed = timeit.timeit(lambda: route(query), number=NUMBER) / NUMBER
+
+        print(f"{query[:48]:48s} {elapsed * 1e9:7.0f}ns -> {route(query)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+import asyncio
+import os
+from contextlib import suppress
+from dataclasses import dataclass
+from hashlib import sha1
+from logging import getLogger
+from time import time
+from typing import Optional, Dict, Tuple, TYPE_CHECKING
+
+import aiohttp
+from aiohttp import web
+from lavalink import AudioTrack, decode_track
+
+from lava.cache import TTLCache
+from lava.extraction import Extractor
+from lava.http import LazySession
+from lava.metrics import audio_cache_plays
+
+if TYPE_CHECKING:
+    from lava.classes.lavalink_client import LavalinkClient
+
+
+@dataclass
+class CachedAudio:
+    path: str
+    size: int
+    hits: int
+    last_used: float
+
+    # The track Lavalink loaded from the local url, loaded on the first play
+    encoded: Optional[str] = None
+
+
+class AudioCache:
+    """
+    Keeps the audio of popular tracks in a size-capped directory, and serves it to Lavalink over a loopback HTTP
+    server, so replaying them doesn't stream from upstream again.
+
+    A track is downloaded in the background once it's played a number of times. When the directory is full, the
+    least frequently played files are evicted first, the least recently played among equally frequent ones. Plays
+    count less the longer ago a file was last played, so formerly popular files age out. A track whose cached audio
+    had to be discarded needs twice as many plays to be downloaded again, each time.
+    """
+    CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, directory: str, max_bytes: int, extractor: Extractor, threshold: int = 3,
+                 host: str = "127.0.0.1", port: int = 8766, base_url: Optional[str] = None,
+                 max_duration: int = 20 * 60 * 1000, download_concurrency: int = 2,
+                 popularity_ttl: float = 7 * 24 * 60 * 60, half_life: float = 24 * 60 * 60):
+        """
+        :param directory: The directory to store the audio in.
+        :param max_bytes: The max total size of the stored audio.
+        :param extractor: The extractor resolving the stream urls of tracks from their pages.
+        :param threshold: How many plays a track needs to be cached.
+        :param host: The host the server binds to.
+        :param port: The port the server binds to.
+        :param base_url: The url Lavalink reaches the server at, defaults to http://host:port.
+        :param max_duration: The max duration of a cached track, in milliseconds.
+        :param download_concurrency: The max amount of downloads running at once.
+        :param popularity_ttl: How many seconds a track's play count is kept for since its last play.
+        :param half_life: How many seconds after its last play the plays of a cached file count half as much.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.extractor = extractor
+        self.threshold = threshold
+        self.host = host
+        self.port = port
+        self.base_url = (base_url or f"http://{host}:{port}").rstrip("/")
+        self.max_duration = max_duration
+        self.download_concurrency = download_concurrency
+        self.half_life = half_life
+
+        # File name -> the stored audio
+        self.entries: Dict[str, CachedAudio] = {}
+        self.size: int = 0
+
+        # Track uri -> how many times it was played
+        self.plays: TTLCache[str, int] = TTLCache(8192, popularity_ttl)
+
+        # Track uri -> how many times its cached audio was discarded
+        self.discards: TTLCache[str, int] = TTLCache(8192, popularity_ttl)
+
+        self.downloads: Dict[str, asyncio.Task] = {}
+
+        self.runner: Optional[web.AppRunner] = None
+
+        self.http = LazySession(timeout=aiohttp.ClientTimeout(total=None, sock_read=30))
+        self._semaphore = asyncio.Semaphore(download_concurrency)
+
+        self.logger = getLogger("lava.audio_cache")
+
+    @staticmethod
+    def name_of(track: AudioTrack) -> Optional[str]:
+        return sha1(track.uri.encode()).hexdigest() if track.uri else None
+
+    def _scan(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+
+        for entry in os.scandir(self.directory):
+            if not entry.is_file():
+                continue
+
+            if entry.name.endswith(".part"):  # Left over by a download that was interrupted
+                os.remove(entry.path)
+                continue
+
+            stat = entry.stat()
+
+            self.entries[entry.name] = CachedAudio(entry.path, stat.st_size, 0, stat.st_mtime)
+            self.size += stat.st_size
+
+    async def start(self) -> None:
+        if self.runner:
+            return
+
+        await asyncio.to_thread(self._scan)
+
+        app = web.Application()
+        app.router.add_get("/audio/{name}", self.handle_audio)
+
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+
+        await web.TCPSite(self.runner, self.host, self.port).start()
+
+        self.logger.info(
+            "Serving %d cached tracks (%d MiB) on %s", len(self.entries), self.size // 1024 // 1024, self.base_url
+        )
+
+    async def stop(self) -> None:
+        for task in self.downloads.values():
+            task.cancel()
+
+        if self.runner:
+            await self.runner.cleanup()
+            self.runner = None
+
+        await self.http.close()
+
+    async def handle_audio(self, request: web.Request) -> web.StreamResponse:
+        if not (entry := self.entries.get(request.match_info["name"])):
+            raise web.HTTPNotFound()
+
+        # Sent with sendfile, and handles the range requests Lavalink seeks with
+        return web.FileResponse(entry.path, headers={"Content-Type": "application/octet-stream"})
+
+    async def load(self, client: "LavalinkClient", track: AudioTrack) -> Optional[str]:
+        """
+        Get the encoded track playing a track from the cache.
+        :param client: The Lavalink client to load the local url with.
+        :param track: The track.
+        :return: The encoded track, None if the track isn't cached.
+        """
+        name = self.name_of(track)
+
+        if not name or not (entry := self.entries.get(name)):
+            audio_cache_plays.inc(result="miss")
+            return None
+
+        if entry.encoded is None:
+            result = await client.get_tracks(f"{self.base_url}/audio/{name}")
+
+            if not result.tracks:
+                self.logger.warning(
+                    "Lavalink couldn't load the cached audio of %s from %s, discarding it. "
+                    "Check that AUDIO_CACHE_URL is reachable from Lavalink", track.uri, self.base_url
+                )
+                self.discard(track)
+
+                audio_cache_plays.inc(result="miss")
+                return None
+
+            entry.encoded = result.tracks[0].track
+
+        entry.hits += 1
+        entry.last_used = time()
+
+        audio_cache_plays.inc(result="hit")
+
+        return entry.encoded
+
+    def record_play(self, track: AudioTrack) -> None:
+        """
+        Count a play of a track, and start caching it once it's popular enough.
+        :param track: The track that started playing.
+        """
+        if track.is_stream or track.duration > self.max_duration or track.track is None:
+            return
+
+        name = self.name_of(track)
+
+        if not name or name in self.entries or name in self.downloads:
+            return
+
+        plays = self.plays.get(track.uri, 0) + 1
+
+        self.plays.set(track.uri, plays)
+
+        if plays < self.threshold * 2 ** self.discards.get(track.uri, 0, count=False):
+            return
+
+        try:
+            # The track actually played, e.g. the YouTube video a Spotify track resolved to
+            played = decode_track(track.track)
+        except Exception:  # skipcq: PYL-W0703
+            self.logger.debug("Failed to decode %s, not caching it", track.uri, exc_info=True)
+            return
+
+        self.downloads[name] = asyncio.get_running_loop().create_task(
+            self._download(name, played.uri, direct=played.source_name == "http")
+        )
+
+    async def _stream_url(self, url: str, direct: bool) -> Optional[str]:
+        if direct:
+            return url
+
+        info = await self.extractor.extract(url)
+
+        return info['url'] if info else None
+
+    @staticmethod
+    def _write(path: str, chunk: bytes) -> None:
+        with open(path, "ab") as f:
+            f.write(chunk)
+
+    def _remove(self, name: str) -> None:
+        if not (entry := self.entries.pop(name, None)):
+            return
+
+        self.size -= entry.size
+
+        with suppress(FileNotFoundError):
+            os.remove(entry.path)
+
+    def _make_room(self, size: int) -> None:
+        """
+        Evict the least popular files until there's room for a new one.
+        :param size: The size of the new file.
+        """
+        now = time()
+
+        def popularity(name: str) -> Tuple[float, float]:
+            entry = self.entries[name]
+
+            return entry.hits * 0.5 ** ((now - entry.last_used) / self.half_life), entry.last_used
+
+        while self.entries and self.size + size > self.max_bytes:
+            self._remove(min(self.entries, key=popularity))
+
+    def discard(self, track: AudioTrack) -> None:
+        """
+        Remove the cached audio of a track, e.g. because it failed to play. Its plays start over, and it needs more of
+        them to be downloaded again, so a file Lavalink can't play isn't downloaded again on every play.
+        """
+        if not (name := self.name_of(track)):
+            return
+
+        self._remove(name)
+
+        self.plays.delete(track.uri)
+        self.discards.set(track.uri, self.discards.get(track.uri, 0, count=False) + 1)
+
+    async def _download(self, name: str, url: str, direct: bool) -> None:
+        path = os.path.join(self.directory, name)
+        partial_path = f"{path}.part"
+
+        # A single file may take up a quarter of the cache at most
+        max_size = self.max_bytes // 4
+        size = 0
+
+        try:
+            if not (stream_url := await self._stream_url(url, direct)):
+                return
+
+            async with self._semaphore, self.http.session.get(stream_url) as response:
+                if response.status != 200:
+                    self.logger.warning("Failed to download %s for the cache: %d", url, response.status)
+                    return
+
+                if (response.content_length or 0) > max_size:
+                    return
+
+                async for chunk in response.content.iter_chunked(self.CHUNK_SIZE):
+                    if (size := size + len(chunk)) > max_size:
+                        return
+
+                    await asyncio.to_thread(self._write, partial_path, chunk)
+
+            await asyncio.to_thread(os.replace, partial_path, path)
+        except (aiohttp.ClientError, asyncio.TimeoutError, OSError):
+            self.logger.warning("Failed to download %s for the cache", url, exc_info=True)
+            return
+        finally:
+            self.downloads.pop(name, None)
+
+            with suppress(FileNotFoundError):
+                os.remove(partial_path)
+
+        self._make_room(size)
+
+        self.entries[name] = CachedAudio(path, size, 0, time())
+        self.size += size
+
+        self.logger.info("Cached %s (%d KiB)", url, size // 1024)
@@ -0,0 +1,223 @@
+import asyncio
+import re
+from dataclasses import dataclass
+from functools import partial
+from logging import getLogger
+from time import time
+from typing import Optional, Dict, Any, Tuple, List
+from urllib.parse import urlparse, parse_qs
+
+import aiohttp
+
+from lava.cache import TTLCache, SingleFlightCache
+from lava.errors import BilibiliError
+from lava.extraction import stream_expiry
+from lava.http import LazySession
+
+# Akamai signs its urls with a token like "exp=1700000000~acl=...~hmac=..."
+AKAMAI_EXPIRY_RX = re.compile(r'(?:^|~)exp=(\d+)')
+
+
+def audio_expiry(url: str) -> Optional[float]:
+    """
+    Get the expiry timestamp of a Bilibili audio url, which is signed either by Bilibili's own CDN or by Akamai.
+    :param url: The audio url.
+    :return: The unix timestamp the url expires at, None if it doesn't say.
+    """
+    if (expiry := stream_expiry(url)) is not None:
+        return expiry
+
+    for token in parse_qs(urlparse(url).query).get("hdnts", []):
+        if match := AKAMAI_EXPIRY_RX.search(token):
+            return float(match.group(1))
+
+    return None
+
+
+@dataclass
+class BilibiliAudio:
+    bvid: str
+    cid: int
+    title: str
+    author: str
+    duration: int  # In milliseconds
+    artwork_url: Optional[str]
+    url: str
+
+
+class BilibiliClient:
+    """
+    A minimal async client of the Bilibili web API, resolving videos to their audio stream over one pooled HTTP
+    session. Resolved audio is cached until its url expires, and concurrent resolutions of the same video share a
+    single lookup.
+    """
+    API_BASE = "https://api.bilibili.com"
+
+    HEADERS = {
+        'referer': 'https://www.bilibili.com/',
+        'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
+                      'Chrome/120.0.0.0 Safari/537.36'
+    }
+
+    # The CDN hosts serving audio without a referer, which Lavalink doesn't send
+    PREFERRED_HOSTS = ("upos-hz-mirrorakam.akamaized.net",)
+
+    def __init__(self, max_concurrency: int = 8, maxsize: int = 1024, default_ttl: float = 30 * 60,
+                 short_link_ttl: float = 24 * 60 * 60, expiry_margin: float = 60.0):
+        """
+        :param max_concurrency: The max amount of requests in flight at once.
+        :param maxsize: The max amount of cached videos and short links, each.
+        :param default_ttl: How many seconds resolved audio whose url doesn't say when it expires is cached for.
+        :param short_link_ttl: How many seconds an expanded short link is cached for.
+        :param expiry_margin: How many seconds before its url expires resolved audio stops being served.
+        """
+        self.max_concurrency = max_concurrency
+        self.short_link_ttl = short_link_ttl
+        self.default_ttl = default_ttl
+        self.expiry_margin = expiry_margin
+
+        # (bvid, page) -> the resolved audio
+        self.audio: SingleFlightCache[Tuple[str, int], Optional[BilibiliAudio]] = SingleFlightCache(
+            maxsize, default_ttl, self._ttl_of
+        )
+
+        # Short link -> the url it redirects to
+        self.short_links: TTLCache[str, str] = TTLCache(maxsize, short_link_ttl)
+
+        self.http = LazySession(limit=max_concurrency, timeout=aiohttp.ClientTimeout(total=10), headers=self.HEADERS)
+
+        self.logger = getLogger("lava.bilibili")
+
+    async def request(self, path: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Make a GET request to the Bilibili web API.
+        :param path: The path of the endpoint, e.g. "/x/web-interface/view".
+        :param params: The query parameters.
+        :return: The data of the response, None if the video was not found.
+        :raise BilibiliError: If the request failed.
+        """
+        try:
+            async with self.http.session.get(f"{self.API_BASE}{path}", params=params) as response:
+                if response.status != 200:
+                    raise BilibiliError(f"Bilibili API answered {response.status} for {path}")
+
+                body = await response.json(content_type=None)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            raise BilibiliError(f"Failed to request {path} from Bilibili API") from e
+
+        # -404 and 62002 mean the video doesn't exist or is invisible, -400 that the bvid is malformed
+        if body['code'] in (-404, -400, 62002):
+            return None
+
+        if body['code'] != 0:
+            raise BilibiliError(f"Bilibili API answered code {body['code']} for {path}: {body.get('message')}")
+
+        return body['data']
+
+    async def expand_short_link(self, url: str) -> Optional[str]:
+        """
+        Expand a b23.tv short link from its redirect, without fetching the page it points to.
+        :param url: The short link.
+        :return: The url it redirects to, None if it doesn't redirect.
+        :raise BilibiliError: If the request failed.
+        """
+        if (cached := self.short_links.get(url)) is not None:
+            return cached
+
+        try:
+            async with self.http.session.head(url, allow_redirects=False) as response:
+                location = response.headers.get("Location")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise BilibiliError(f"Failed to expand short link {url}") from e
+
+        if not location:
+            return None
+
+        self.short_links.set(url, location)
+
+        return location
+
+    def pick_url(self, play_url: Dict[str, Any]) -> Optional[str]:
+        """
+        Pick the audio url to play from a playurl response.
+        :param play_url: The data of a playurl response.
+        :return: The url of the best audio stream, on a preferred host if it has a mirror there.
+        """
+        if dash := play_url.get('dash'):
+            streams = sorted(dash.get('audio') or [], key=lambda stream: stream.get('bandwidth', 0), reverse=True)
+
+            if not streams:
+                return None
+
+            candidates: List[str] = [streams[0]['baseUrl'], *(streams[0].get('backupUrl') or [])]
+
+            for candidate in candidates:
+                if urlparse(candidate).hostname in self.PREFERRED_HOSTS:
+                    return candidate
+
+            return candidates[0]
+
+        if durl := play_url.get('durl'):  # Old videos without DASH only come as a single muxed file
+            return durl[0]['url']
+
+        return None
+
+    def _ttl_of(self, _: Tuple[str, int], audio: Optional[BilibiliAudio]) -> Optional[float]:
+        if audio is None:
+            return None
+
+        if (expiry := audio_expiry(audio.url)) is None:
+            return self.default_ttl
+
+        return max(0.0, expiry - time() - self.expiry_margin)
+
+    async def _resolve(self, bvid: str, page: int) -> Optional[BilibiliAudio]:
+        view = await self.request("/x/web-interface/view", {"bvid": bvid})
+
+        if not view:
+            return None
+
+        pages = view.get('pages') or [{'cid': view['cid'], 'part': view['title'], 'duration': view['duration']}]
+
+        if not 1 <= page <= len(pages):
+            return None
+
+        part = pages[page - 1]
+
+        play_url = await self.request(
+            "/x/player/playurl", {"bvid": bvid, "cid": part['cid'], "fnval": 16, "fourk": 1}
+        )
+
+        if not play_url or not (url := self.pick_url(play_url)):
+            return None
+
+        return BilibiliAudio(
+            bvid=bvid,
+            cid=part['cid'],
+            title=view['title'] if len(pages) == 1 else f"{view['title']} - {part['part']}",
+            author=view['owner']['name'],
+            duration=part['duration'] * 1000,
+            artwork_url=view.get('pic'),
+            url=url
+        )
+
+    async def resolve(self, bvid: str, page: int = 1) -> Optional[BilibiliAudio]:
+        """
+        Resolve a video to its audio stream.
+        :param bvid: The bvid of the video.
+        :param page: The page of the video, for videos with several parts.
+        :return: The audio, None if the video or the page doesn't exist.
+        :raise BilibiliError: If the API failed.
+        """
+        return await self.audio.load((bvid, page), partial(self._resolve, bvid, page))
+
+    def invalidate(self, bvid: str, page: int = 1) -> None:
+        """
+        Drop the resolved audio of a video, e.g. when its url stopped working before it expired.
+        """
+        self.audio.delete((bvid, page))
+
+    async def close(self) -> None:
+        self.audio.close()
+
+        await self.http.close()
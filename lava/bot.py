@@ -1,14 +1,24 @@
 import json
+from collections import Counter
+from inspect import isawaitable
 from logging import Logger
 from os import getenv
-from typing import Optional
+from time import monotonic
+from typing import Optional, Dict, Callable, Any, Awaitable, Union, List
 
 from disnake import Locale
 from disnake.ext.commands import Bot as OriginalBot
 
+from lava.audio_cache import AudioCache
+from lava.classes.guild_executor import GuildExecutor
 from lava.classes.lavalink_client import LavalinkClient
+from lava.krabbe.autocomplete import AutocompletePipeline
 from lava.krabbe.client import KavaClient
 from lava.krabbe.handlers import add_handlers
+from lava.extraction import Extractor
+from lava.krabbe.load import LoadReporter
+from lava.metrics import MetricsServer, lavalink_active_players, kava_pending_requests, permission_cache_lookups, \
+    LabelValues, loop_lag_monitor, kava_last_frame_age_seconds, audio_cache_bytes
 from lava.source import SourceManager
 
 
@@ -19,11 +29,42 @@ class Bot(OriginalBot):
         self.logger = logger
 
         self._lavalink: Optional[LavalinkClient] = None
+        self.source_manager: Optional[SourceManager] = None
+
+        self.guild_executor = GuildExecutor()
+
+        self.autocomplete = AutocompletePipeline(self, concurrency=int(getenv("AUTOCOMPLETE_CONCURRENCY", "4")))
 
         with open("configs/icons.json", "r", encoding="utf-8") as f:
             self.icons = json.load(f)
 
-        self.kava_client = KavaClient(self, getenv("KRABBE_URI"))
+        batch_window_ms = getenv("KAVA_BATCH_WINDOW_MS")
+
+        self.kava_client = KavaClient(
+            self, getenv("KRABBE_URI"),
+            batch_window=float(batch_window_ms) / 1000 if batch_window_ms else None,
+            permission_ttl=float(getenv("KAVA_PERMISSION_TTL", "15"))
+        )
+
+        metrics_port = getenv("METRICS_PORT")
+
+        self.metrics_server: Optional[MetricsServer] = MetricsServer(
+            host=getenv("METRICS_HOST", "127.0.0.1"), port=int(metrics_port)
+        ) if metrics_port else None
+
+        self.load_reporter = LoadReporter(self, interval=float(getenv("KAVA_LOAD_REPORT_INTERVAL", "15")))
+
+        audio_cache_dir = getenv("AUDIO_CACHE_DIR")
+
+        self.audio_cache: Optional[AudioCache] = AudioCache(
+            audio_cache_dir,
+            max_bytes=int(getenv("AUDIO_CACHE_MAX_MB", "2048")) * 1024 * 1024,
+            extractor=Extractor({"format": "bestaudio", "quiet": True}, max_workers=1),
+            threshold=int(getenv("AUDIO_CACHE_THRESHOLD", "3")),
+            host=getenv("AUDIO_CACHE_HOST", "127.0.0.1"),
+            port=int(getenv("AUDIO_CACHE_PORT", "8766")),
+            base_url=getenv("AUDIO_CACHE_URL")
+        ) if audio_cache_dir else None
 
     async def on_ready(self):
         self.logger.info("The bot is ready! Logged in as %s" % self.user)
@@ -32,6 +73,45 @@ class Bot(OriginalBot):
 
         await self.__setup_kava_client()
 
+        await self.__setup_metrics()
+
+        if self.audio_cache:
+            await self.audio_cache.start()
+
+    async def close(self) -> None:
+        """
+        Stop the bot's services and release their resources, then close the bot.
+        """
+        self.logger.info("Shutting down...")
+
+        closers: List[Callable[[], Union[Awaitable[Any], Any]]] = [
+            self.load_reporter.stop,
+            self.kava_client.close,
+            self.kava_client.dispatcher.stop,
+            loop_lag_monitor.stop
+        ]
+
+        if self.metrics_server:
+            closers.append(self.metrics_server.stop)
+
+        if self.audio_cache:
+            closers += [self.audio_cache.stop, self.audio_cache.extractor.close]
+
+        if self.source_manager:
+            closers.append(self.source_manager.close)
+
+        if self._lavalink:
+            closers += [self._lavalink.load_cache.close, self._lavalink.close]
+
+        for closer in closers:
+            try:
+                if isawaitable(result := closer()):
+                    await result
+            except Exception:  # skipcq: PYL-W0703
+                self.logger.exception("Failed to run %s while shutting down", getattr(closer, "__qualname__", closer))
+
+        await super().close()
+
     @property
     def lavalink(self) -> LavalinkClient:
         if not self.is_ready():
@@ -50,6 +130,7 @@ class Bot(OriginalBot):
         self.logger.info("Setting up lavalink client...")
 
         self._lavalink = LavalinkClient(self, user_id=self.user.id)
+        self._lavalink.audio_cache = self.audio_cache
 
         self.logger.info("Loading lavalink nodes...")
 
@@ -63,7 +144,9 @@ class Bot(OriginalBot):
 
         self.logger.info("Done loading lavalink nodes!")
 
-        self.lavalink.register_source(SourceManager())
+        self.source_manager = SourceManager()
+
+        self.lavalink.register_source(self.source_manager)
 
     async def __setup_kava_client(self) -> None:
         """
@@ -74,6 +157,47 @@ class Bot(OriginalBot):
 
         add_handlers(self.kava_client)
 
+        self.load_reporter.start()
+
+    async def __setup_metrics(self) -> None:
+        """
+        Register the metrics sampled from the bot's state and start the metrics server if it's enabled.
+        :return: None
+        """
+        lavalink_active_players.set_function(self.__count_players_per_node)
+        kava_pending_requests.set_function(lambda: {(): len(self.kava_client.pending_requests)})
+        kava_last_frame_age_seconds.set_function(
+            lambda: {(): monotonic() - self.kava_client.last_frame_at} if self.kava_client.last_frame_at else {}
+        )
+        permission_cache_lookups.set_function(
+            lambda: {
+                ("hit",): self.kava_client.permission_cache.hits,
+                ("miss",): self.kava_client.permission_cache.misses
+            }
+        )
+
+        if self.audio_cache:
+            audio_cache_bytes.set_function(lambda: {(): self.audio_cache.size})
+
+        loop_lag_monitor.start()
+
+        if self.metrics_server:
+            await self.metrics_server.start()
+
+    def __count_players_per_node(self) -> Dict[LabelValues, float]:
+        """
+        Count the connected players on each lavalink node.
+        :return: A dict mapping node names to player counts.
+        """
+        if self._lavalink is None:
+            return {}
+
+        counts = Counter(
+            player.node.name for player in self._lavalink.player_manager.players.values() if player.is_connected
+        )
+
+        return {(name,): count for name, count in counts.items()}
+
     def get_text(self, key: str, locale: Locale, default: str = None) -> str:
         """
         Gets a text from i18n files by key
@@ -0,0 +1,185 @@
+import asyncio
+from collections import OrderedDict
+from time import monotonic
+from typing import Generic, TypeVar, Optional, Callable, Tuple, Hashable, Dict, Awaitable
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+MISSING = object()
+
+
+class TTLCache(Generic[K, V]):
+    """
+    A size-bounded LRU cache whose entries expire after a time to live.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, max_weight: Optional[int] = None):
+        """
+        :param maxsize: The max amount of entries, the least recently used one is evicted when it's exceeded.
+        :param ttl: The default amount of seconds an entry stays valid.
+        :param max_weight: The max total weight of the entries, e.g. their size in bytes. None for no limit.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_weight = max_weight
+
+        self.hits: int = 0
+        self.misses: int = 0
+        self.weight: int = 0
+
+        self._entries: OrderedDict[K, Tuple[float, V, int]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: K) -> bool:
+        return self.get(key, MISSING, count=False) is not MISSING
+
+    @property
+    def hit_ratio(self) -> float:
+        """
+        The ratio of lookups that were served from the cache.
+        """
+        total = self.hits + self.misses
+
+        return self.hits / total if total else 0.0
+
+    def get(self, key: K, default: Optional[V] = None, count: bool = True) -> Optional[V]:
+        """
+        Get an entry from the cache.
+        :param key: The key of the entry.
+        :param default: The value to return if there's no valid entry.
+        :param count: Whether this lookup counts towards the hit and miss counters.
+        :return: The cached value, or the default.
+        """
+        entry = self._entries.get(key)
+
+        if entry is not None and entry[0] <= monotonic():
+            self.delete(key)
+            entry = None
+
+        if entry is None:
+            if count:
+                self.misses += 1
+
+            return default
+
+        self._entries.move_to_end(key)
+
+        if count:
+            self.hits += 1
+
+        return entry[1]
+
+    def set(self, key: K, value: V, ttl: Optional[float] = None, weight: int = 0) -> None:
+        """
+        Put an entry into the cache.
+        :param key: The key of the entry.
+        :param value: The value of the entry.
+        :param ttl: The amount of seconds this entry stays valid, defaults to the ttl of the cache.
+        :param weight: The weight of the entry, counted towards max_weight.
+        """
+        self.delete(key)
+
+        self._entries[key] = (monotonic() + (self.ttl if ttl is None else ttl), value, weight)
+        self.weight += weight
+
+        while len(self._entries) > self.maxsize or (self.max_weight is not None and self.weight > self.max_weight):
+            _, (_, _, evicted_weight) = self._entries.popitem(last=False)
+            self.weight -= evicted_weight
+
+    def delete(self, key: K) -> None:
+        """
+        Remove an entry from the cache if it exists.
+        :param key: The key of the entry.
+        """
+        entry = self._entries.pop(key, None)
+
+        if entry is not None:
+            self.weight -= entry[2]
+
+    def invalidate(self, predicate: Callable[[K], bool]) -> int:
+        """
+        Remove every entry whose key matches a predicate.
+        :param predicate: A function returning whether an entry should be removed given its key.
+        :return: The amount of removed entries.
+        """
+        keys = [key for key in self._entries if predicate(key)]
+
+        for key in keys:
+            self.delete(key)
+
+        return len(keys)
+
+    def clear(self) -> None:
+        """
+        Remove every entry from the cache.
+        """
+        self._entries.clear()
+        self.weight = 0
+
+
+class SingleFlightCache(Generic[K, V]):
+    """
+    A TTLCache in front of an async loader, where concurrent loads of the same key share a single task.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, ttl_of: Optional[Callable[[K, V], Optional[float]]] = None):
+        """
+        :param maxsize: The max amount of cached values.
+        :param ttl: The default amount of seconds a value is cached for.
+        :param ttl_of: A function returning how many seconds a loaded value is cached for given its key,
+                       None not to cache it. Every value is cached for the default ttl if not provided.
+        """
+        self.cache: TTLCache[K, V] = TTLCache(maxsize, ttl)
+        self.in_flight: Dict[K, asyncio.Task] = {}
+
+        self.ttl_of = ttl_of
+
+    def get(self, key: K, default: Optional[V] = None, count: bool = True) -> Optional[V]:
+        """
+        Get a cached value without loading it, see TTLCache.get().
+        """
+        return self.cache.get(key, default, count)
+
+    def delete(self, key: K) -> None:
+        self.cache.delete(key)
+
+    async def _load(self, key: K, loader: Callable[[], Awaitable[V]]) -> V:
+        try:
+            value = await loader()
+        finally:
+            self.in_flight.pop(key, None)
+
+        if (ttl := self.ttl_of(key, value) if self.ttl_of else self.cache.ttl) is not None:
+            self.cache.set(key, value, ttl=ttl)
+
+        return value
+
+    async def load(self, key: K, loader: Callable[[], Awaitable[V]], count: bool = True) -> V:
+        """
+        Get a value from the cache, loading it if it isn't cached. Only the first caller's loader runs, the callers
+        asking for the same key meanwhile wait for its result, or its exception.
+        :param key: The key of the value.
+        :param loader: A function returning the awaitable loading the value.
+        :param count: Whether the cache lookup counts towards the hit and miss counters.
+        :return: The value.
+        """
+        if (cached := self.cache.get(key, MISSING, count)) is not MISSING:
+            return cached
+
+        if key not in self.in_flight:
+            self.in_flight[key] = asyncio.get_running_loop().create_task(self._load(key, loader))
+
+        # Shielded so a cancelled caller doesn't cancel the load others are waiting for
+        return await asyncio.shield(self.in_flight[key])
+
+    def close(self) -> None:
+        """
+        Cancel the loads in flight.
+        """
+        for task in self.in_flight.values():
+            task.cancel()
+
+        self.in_flight.clear()
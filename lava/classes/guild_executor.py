@@ -0,0 +1,110 @@
+import asyncio
+from asyncio import Future, Task
+from collections import deque
+from logging import getLogger
+from typing import Dict, Deque, Callable, Awaitable, Optional, TypeVar, Any, Set
+
+T = TypeVar("T")
+
+
+class GuildOperation:
+    """
+    An operation waiting in the mailbox of a guild.
+    """
+    __slots__ = ("function", "merge_key", "count", "future")
+
+    def __init__(self, function: Callable[..., Awaitable[Any]], merge_key: Optional[str] = None):
+        self.function = function
+        self.merge_key = merge_key
+        self.count = 1
+        self.future: Future = asyncio.get_running_loop().create_future()
+
+
+class GuildExecutor:
+    """
+    Runs operations on the player of each guild one at a time, in the order they arrived.
+    Operations of different guilds still run concurrently.
+    """
+
+    def __init__(self):
+        self.mailboxes: Dict[int, Deque[GuildOperation]] = {}
+        self.workers: Dict[int, Task] = {}
+
+        # The guilds whose worker is running an operation, which has already left the mailbox
+        self.running: Set[int] = set()
+
+        self.logger = getLogger("lava.guild_executor")
+
+    def _enqueue(self, guild_id: int, operation: GuildOperation) -> None:
+        self.mailboxes.setdefault(guild_id, deque()).append(operation)
+
+        if guild_id not in self.workers:
+            self.workers[guild_id] = asyncio.get_running_loop().create_task(self._work(guild_id))
+
+    async def _work(self, guild_id: int) -> None:
+        mailbox = self.mailboxes[guild_id]
+
+        try:
+            while mailbox:
+                operation = mailbox.popleft()
+
+                self.running.add(guild_id)
+
+                try:
+                    if operation.merge_key is None:
+                        result = await operation.function()
+                    else:
+                        result = await operation.function(operation.count)
+                except Exception as error:  # skipcq: PYL-W0703
+                    operation.future.set_exception(error)
+                else:
+                    operation.future.set_result(result)
+                finally:
+                    self.running.discard(guild_id)
+        finally:
+            del self.workers[guild_id]
+            del self.mailboxes[guild_id]
+
+    def pending(self, guild_id: int) -> int:
+        """
+        Get the amount of operations of a guild that are running or waiting to run.
+        :param guild_id: The ID of the guild.
+        :return: The amount of operations.
+        """
+        return len(self.mailboxes.get(guild_id, ())) + (guild_id in self.running)
+
+    async def run(self, guild_id: int, function: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run an operation once all the earlier operations of the guild are done.
+        :param guild_id: The ID of the guild the operation belongs to.
+        :param function: A function returning the awaitable to run.
+        :return: The result of the operation.
+        """
+        operation = GuildOperation(function)
+
+        self._enqueue(guild_id, operation)
+
+        return await asyncio.shield(operation.future)
+
+    async def run_merged(self, guild_id: int, merge_key: str, function: Callable[[int], Awaitable[T]]) -> T:
+        """
+        Like run(), but if the last operation still waiting in the mailbox has the same merge key,
+        the two are collapsed into one, e.g. three pending skips becoming a single skip of three tracks.
+        :param guild_id: The ID of the guild the operation belongs to.
+        :param merge_key: Operations with the same key can be collapsed.
+        :param function: A function taking the amount of collapsed operations and returning the awaitable to run.
+        :return: The result of the collapsed operation.
+        """
+        mailbox = self.mailboxes.get(guild_id)
+
+        if mailbox and mailbox[-1].merge_key == merge_key:
+            operation = mailbox[-1]
+            operation.count += 1
+
+            self.logger.debug("Merged operation %s in guild %s, now %d times", merge_key, guild_id, operation.count)
+        else:
+            operation = GuildOperation(function, merge_key)
+
+            self._enqueue(guild_id, operation)
+
+        return await asyncio.shield(operation.future)
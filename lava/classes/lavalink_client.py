@@ -1,17 +1,115 @@
-from typing import TYPE_CHECKING
+import re
+from functools import partial
+from time import perf_counter
+from typing import TYPE_CHECKING, Optional, Tuple
 
-from lavalink import Client
+from lavalink import Client, Node, LoadResult, LoadType, AudioTrack
 
+from lava.audio_cache import AudioCache
+from lava.cache import SingleFlightCache
 from lava.classes.player import LavaPlayer
 from lava.classes.player_manager import LavaPlayerManager
+from lava.metrics import lavalink_load_seconds, load_cache_lookups, load_cache_saved_seconds
+from lava.resolver import RacingResolver
 
 if TYPE_CHECKING:
     from lava.bot import Bot
 
+SEARCH_PREFIX_RX = re.compile(r'^[a-z]+search:', re.IGNORECASE)
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize a query so equivalent ones share a cache entry, searches are case and whitespace insensitive.
+    :param query: The query.
+    :return: The normalized query.
+    """
+    query = query.strip()
+
+    if SEARCH_PREFIX_RX.match(query):
+        return " ".join(query.lower().split())
+
+    return query
+
+
+def copy_load_result(result: LoadResult) -> LoadResult:
+    """
+    Copy a load result along with its tracks, so players mutating their tracks don't affect the cached ones.
+    """
+    return LoadResult(
+        result.load_type, [AudioTrack(track) for track in result.tracks], result.playlist_info, result.plugin_info,
+        result.error
+    )
+
 
 class LavalinkClient(Client):
-    def __init__(self, bot: "Bot", *args, **kwargs):
+    URL_TTL = 30 * 60
+    SEARCH_TTL = 10 * 60
+    EMPTY_TTL = 60
+
+    def __init__(self, bot: "Bot", *args, load_cache_size: int = 2048, **kwargs):
         super().__init__(player=LavaPlayer, *args, **kwargs)
 
         self.bot: Bot = bot
         self.player_manager: LavaPlayerManager = LavaPlayerManager(bot=bot, client=self)
+
+        # Normalized query -> the result and how many seconds loading it took
+        self.load_cache: SingleFlightCache[str, Tuple[LoadResult, float]] = SingleFlightCache(
+            load_cache_size, self.URL_TTL, self._ttl_of
+        )
+
+        self.resolver = RacingResolver(self)
+
+        # Set by the bot when the on-disk audio cache is enabled
+        self.audio_cache: Optional[AudioCache] = None
+
+    async def _load(self, query: str, node: Optional[Node], check_local: bool) -> Tuple[LoadResult, float]:
+        start = perf_counter()
+
+        result = await super().get_tracks(query, node=node, check_local=check_local)
+
+        latency = perf_counter() - start
+
+        lavalink_load_seconds.observe(latency, node=node.name if node else "any", load_type=result.load_type.value)
+
+        return result, latency
+
+    def _ttl_of(self, key: str, loaded: Tuple[LoadResult, float]) -> Optional[float]:
+        result, _ = loaded
+
+        if result.load_type == LoadType.ERROR:
+            return None
+
+        if result.load_type == LoadType.EMPTY or not result.tracks:
+            return self.EMPTY_TTL
+
+        return self.SEARCH_TTL if SEARCH_PREFIX_RX.match(key) else self.URL_TTL
+
+    async def get_tracks(self, query: str, node: Optional[Node] = None, check_local: bool = False) -> LoadResult:
+        """
+        Same as the original get_tracks(), but records the latency per node and load type.
+        Lavalink results are shared process-wide: they are cached by normalized query, and concurrent identical
+        queries share one request. Local sources aren't cached, as their results may be loaded further afterwards.
+        Prefer this over Node.get_tracks() so the lookups are measured and cached.
+        """
+        if check_local:
+            result, _ = await self._load(query, node, check_local)
+
+            return result
+
+        key = normalize_query(query)
+
+        if (cached := self.load_cache.get(key)) is not None:
+            result, latency = cached
+
+            load_cache_lookups.inc(result="hit")
+            load_cache_saved_seconds.inc(latency)
+
+            return copy_load_result(result)
+
+        load_cache_lookups.inc(result="coalesced" if key in self.load_cache.in_flight else "miss")
+
+        # Already counted as a miss above
+        result, _ = await self.load_cache.load(key, partial(self._load, query, node, False), count=False)
+
+        return copy_load_result(result)
@@ -1,11 +1,17 @@
 import asyncio
-from time import time
-from typing import TYPE_CHECKING, Optional, Union
+from copy import copy
+from random import randrange
+from time import time, monotonic
+from typing import TYPE_CHECKING, Optional, Union, Iterable, List, Dict, Tuple
 
 from disnake import Message, Locale, ButtonStyle, Embed, Colour, Guild, Interaction
 from disnake.ui import ActionRow, Button
-from lavalink import DefaultPlayer, Node, parse_time
+from lavalink import DefaultPlayer, Node, parse_time, AudioTrack, DeferredAudioTrack, Event, TrackEndEvent, \
+    TrackStartEvent, TrackExceptionEvent
 
+from lava.classes.playlist_ingestion import PlaylistIngestion
+from lava.classes.track_queue import TrackQueue
+from lava.metrics import display_edits, display_edit_seconds, inter_track_gap_seconds
 from lava.utils import get_image_size
 
 if TYPE_CHECKING:
@@ -13,6 +19,9 @@ if TYPE_CHECKING:
 
 
 class LavaPlayer(DefaultPlayer):
+    LOOKAHEAD_DEPTH = 3
+    LOOKAHEAD_CONCURRENCY = 2
+
     def __init__(self, bot: "Bot", guild_id: int, node: Node):
         super().__init__(guild_id, node)
 
@@ -24,6 +33,16 @@ class LavaPlayer(DefaultPlayer):
 
         self.autoplay: bool = False
 
+        self.ingestions: List[PlaylistIngestion] = []
+
+        # Deferred tracks being resolved ahead of time, by the id of the track
+        self._lookahead_tasks: Dict[int, Tuple[DeferredAudioTrack, asyncio.Task]] = {}
+        self._lookahead_semaphore = asyncio.Semaphore(self.LOOKAHEAD_CONCURRENCY)
+        self._lookahead_scheduled: bool = False
+
+        self._transition_started_at: Optional[float] = None
+        self._transition_prefetched: bool = False
+
         self._last_update: int = 0
         self._last_position = 0
         self.position_timestamp = 0
@@ -31,6 +50,26 @@ class LavaPlayer(DefaultPlayer):
         self.__display_image_as_wide: Optional[bool] = None
         self.__last_image_url: str = ""
 
+    @property
+    def queue(self) -> TrackQueue:
+        return self._queue
+
+    @queue.setter
+    def queue(self, tracks: Iterable[AudioTrack]) -> None:
+        """
+        Replacing the queue keeps its epoch and its version increasing, so readers still notice the change.
+        """
+        previous: Optional[TrackQueue] = getattr(self, "_queue", None)
+
+        if previous is not None:
+            self._queue = TrackQueue(tracks, version=previous.version + 1, epoch=previous.epoch)
+        else:
+            self._queue = TrackQueue(tracks)
+        self._queue.listener = self.schedule_lookahead
+
+        if previous is not None:
+            self.schedule_lookahead()
+
     @property
     def guild(self) -> Optional[Guild]:
         if not self._guild:
@@ -149,18 +188,179 @@ class LavaPlayer(DefaultPlayer):
                 )
             ]
 
-        if interaction:
-            await interaction.response.edit_message(
-                content=None, embed=await self.generate_display_embed(), components=components
-            )
+        embed = await self.generate_display_embed()
 
-        else:
-            await self.message.edit(content=None, embed=(await self.generate_display_embed()), components=components)
+        with display_edit_seconds.time():
+            if interaction:
+                await interaction.response.edit_message(content=None, embed=embed, components=components)
+
+            else:
+                await self.message.edit(content=None, embed=embed, components=components)
+
+        display_edits.inc()
 
         self.bot.logger.debug(
             "Updating player in guild %s display message to %s", self.bot.get_guild(self.guild_id), self.message.id
         )
 
+    def add_ingestion(self, ingestion: PlaylistIngestion) -> None:
+        """
+        Track a playlist still loading into this player's queue, forgetting the ones that finished.
+
+        :param ingestion: The ingestion of the playlist.
+        """
+        self.ingestions = [existing for existing in self.ingestions if not existing.done]
+        self.ingestions.append(ingestion)
+
+    def cancel_ingestions(self) -> None:
+        """
+        Stop loading every playlist still loading into this player's queue.
+        """
+        for ingestion in self.ingestions:
+            ingestion.cancel()
+
+        self.ingestions.clear()
+
+    def set_shuffle(self, shuffle: bool) -> None:
+        """
+        Set the shuffle state, and re-target the lookahead since shuffling changes which tracks come next.
+
+        :param shuffle: Whether to shuffle the queue.
+        """
+        super().set_shuffle(shuffle)
+
+        self.schedule_lookahead()
+
+    def schedule_lookahead(self) -> None:
+        """
+        Re-target the lookahead once the current batch of queue changes is done.
+        """
+        if self._lookahead_scheduled:
+            return
+
+        self._lookahead_scheduled = True
+
+        self.bot.loop.call_soon(self._retarget_lookahead)
+
+    def _retarget_lookahead(self) -> None:
+        """
+        Resolve the deferred tracks among the next few in the queue ahead of time,
+        and drop the work for tracks that are no longer among them.
+        """
+        self._lookahead_scheduled = False
+
+        # The next track is picked at random when shuffling, so there's nothing to look ahead to
+        upcoming = self.queue[:self.LOOKAHEAD_DEPTH] if not self.shuffle else []
+
+        targets = {
+            id(track): track for track in upcoming if isinstance(track, DeferredAudioTrack) and track.track is None
+        }
+
+        for key, (_, task) in list(self._lookahead_tasks.items()):
+            if key not in targets:
+                task.cancel()
+                del self._lookahead_tasks[key]
+
+        for key, track in targets.items():
+            if key not in self._lookahead_tasks:
+                self._lookahead_tasks[key] = (track, self.bot.loop.create_task(self._prefetch(track)))
+
+    async def _prefetch(self, track: DeferredAudioTrack) -> None:
+        async with self._lookahead_semaphore:
+            if track.track is not None:
+                return
+
+            try:
+                await track.load(self.client)
+            except asyncio.CancelledError:
+                raise
+            except Exception:  # skipcq: PYL-W0703
+                # Playing the track loads it again and reports the failure
+                self.bot.logger.debug("Failed to resolve %s ahead of time", track.title, exc_info=True)
+
+    def cancel_lookahead(self) -> None:
+        """
+        Stop resolving upcoming tracks ahead of time.
+        """
+        for _, task in self._lookahead_tasks.values():
+            task.cancel()
+
+        self._lookahead_tasks.clear()
+
+    async def play_track(self, track: AudioTrack, *args, **kwargs):
+        """
+        Same as the original play_track(), but waits for the track to finish resolving if the lookahead is on it
+        instead of resolving it a second time, and plays it from the audio cache if it's cached there.
+        """
+        # A track played from the audio cache and queued again, e.g. by looping, is looked up as the original one
+        track = track.extra.get('upstream_track', track)
+
+        if self._transition_started_at is None:
+            self._transition_started_at = monotonic()
+
+        _, task = self._lookahead_tasks.pop(id(track), (None, None))
+
+        if self.client.audio_cache and (encoded := await self.client.audio_cache.load(self.client, track)):
+            if task is not None:
+                task.cancel()
+
+            cached = copy(track)
+            cached.track = encoded
+            cached.extra = {**track.extra, 'upstream_track': track}
+
+            track = cached
+
+        elif task is not None:
+            await asyncio.wait({task})
+
+        self._transition_prefetched = track.track is not None
+
+        return await super().play_track(track, *args, **kwargs)
+
+    async def handle_event(self, event: Event):
+        """
+        Same as the original handle_event(), but also measures the gap between the end of a track and the start of
+        the next one, and reports plays and failures of cached tracks to the audio cache.
+        """
+        if isinstance(event, TrackEndEvent) and event.reason.may_start_next() and self.queue:
+            self._transition_started_at = monotonic()
+
+        elif isinstance(event, TrackStartEvent) and self._transition_started_at is not None:
+            inter_track_gap_seconds.observe(
+                monotonic() - self._transition_started_at, prefetched=str(self._transition_prefetched).lower()
+            )
+
+            self._transition_started_at = None
+
+        if self.client.audio_cache and isinstance(event, TrackStartEvent) \
+                and 'upstream_track' not in event.track.extra:
+            self.client.audio_cache.record_play(event.track)
+
+        elif self.client.audio_cache and isinstance(event, TrackExceptionEvent) \
+                and 'upstream_track' in event.track.extra:
+            self.client.audio_cache.discard(event.track)
+
+        await super().handle_event(event)
+
+    async def skip_tracks(self, count: int = 1) -> None:
+        """
+        Skip the current track and the count - 1 tracks after it, the same as skipping count times.
+
+        :param count: The amount of tracks to skip.
+        """
+        skipped: List[AudioTrack] = []
+
+        # Repeating a single track, every skip replays it
+        if self.loop != 1:
+            for _ in range(min(count - 1, len(self.queue))):
+                # The tracks the skips would have played, picked the way the player picks its next track
+                skipped.append(self.queue.pop(randrange(len(self.queue)) if self.shuffle else 0))
+
+        await self.skip()
+
+        if self.loop == 2:  # Looping the queue, skipped tracks go back to its end
+            self.queue.extend(skipped)
+
     async def generate_display_embed(self) -> Embed:
         """
         Generate the display embed for the player.
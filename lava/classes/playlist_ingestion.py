@@ -0,0 +1,115 @@
+import asyncio
+from logging import getLogger
+from typing import List, Callable, Awaitable, Optional, Iterable, AsyncIterator, Dict, Any, Sequence, Union, Set
+
+from lavalink import AudioTrack, DeferredAudioTrack, LoadResult, LoadType, PlaylistInfo
+
+PageLoader = Callable[[], Awaitable[List[AudioTrack]]]
+
+
+class PlaylistIngestion:
+    """
+    The rest of a playlist that is still being fetched after its first page was returned.
+    Pages are fetched concurrently but handed out in order, so the queue keeps the order of the playlist.
+    """
+
+    def __init__(self, name: str, total: int, loaded: int, pages: Iterable[PageLoader], concurrency: int = 4):
+        """
+        :param name: The name of the playlist.
+        :param total: The amount of tracks in the whole playlist.
+        :param loaded: The amount of tracks already loaded, i.e. on the first page.
+        :param pages: Functions loading each remaining page, in the order of the playlist.
+        :param concurrency: The max amount of pages fetched at once.
+        """
+        self.name = name
+        self.total = total
+        self.loaded = loaded
+        self.concurrency = concurrency
+
+        self.done: bool = False
+        self.failed: bool = False
+        self.cancelled: bool = False
+
+        # The tracks of this playlist put into the queue, the next page goes right after the last one still there
+        self.tracks: Set[AudioTrack] = set()
+
+        self._pages: List[PageLoader] = list(pages)
+        self._task: Optional[asyncio.Task] = None
+
+        self.logger = getLogger("lava.ingestion")
+
+    async def iterate(self) -> AsyncIterator[List[AudioTrack]]:
+        """
+        Fetch the remaining pages, yielding them in order as soon as each one and the ones before it arrived.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def fetch(page: PageLoader) -> List[AudioTrack]:
+            async with semaphore:
+                return await page()
+
+        tasks = [asyncio.ensure_future(fetch(page)) for page in self._pages]
+
+        try:
+            for task in tasks:
+                tracks = await task
+
+                self.loaded += len(tracks)
+
+                yield tracks
+        finally:
+            for task in tasks:
+                task.cancel()
+
+            self.done = True
+
+    async def _run(self, consumer: Callable[[List[AudioTrack]], Awaitable[None]]) -> None:
+        try:
+            async for tracks in self.iterate():
+                if tracks:
+                    await consumer(tracks)
+        except asyncio.CancelledError:
+            raise
+        except Exception:  # skipcq: PYL-W0703
+            self.failed = True
+            self.logger.exception("Failed to load the rest of playlist %s (%d/%d)", self.name, self.loaded, self.total)
+
+    def start(self, consumer: Callable[[List[AudioTrack]], Awaitable[None]]) -> None:
+        """
+        Start fetching the remaining pages in the background.
+        :param consumer: A function called with the tracks of each page, in order.
+        """
+        if not self._task:
+            self._task = asyncio.get_running_loop().create_task(self._run(consumer))
+
+    def cancel(self) -> None:
+        """
+        Stop fetching the remaining pages.
+        """
+        if self._task and not self._task.done():
+            self._task.cancel()
+
+        self.done = True
+        self.cancelled = True
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "loaded": self.loaded,
+            "total": self.total,
+            "done": self.done,
+            "failed": self.failed
+        }
+
+
+class PartialLoadResult(LoadResult):
+    """
+    A playlist load result holding only the first page of tracks, the rest is loaded by its ingestion.
+    """
+    __slots__ = ('ingestion',)
+
+    def __init__(self, tracks: Sequence[Union[AudioTrack, DeferredAudioTrack]], playlist_info: PlaylistInfo,
+                 ingestion: PlaylistIngestion):
+        super().__init__(LoadType.PLAYLIST, tracks, playlist_info)
+
+        self.ingestion: PlaylistIngestion = ingestion
@@ -0,0 +1,93 @@
+from secrets import token_hex
+from typing import Iterable, SupportsIndex, Union, Any, Callable, Optional
+
+from lavalink import AudioTrack
+
+
+class TrackQueue(list):
+    """
+    A list of tracks that counts its mutations, so readers can cheaply tell whether it changed since they last saw it.
+    """
+
+    def __init__(self, iterable: Iterable[AudioTrack] = (), version: int = 0, epoch: Optional[str] = None):
+        """
+        :param iterable: The initial tracks.
+        :param version: The initial version of the queue.
+        :param epoch: The epoch of the queue, random by default.
+        """
+        super().__init__(iterable)
+
+        self.version: int = version
+
+        # The version restarts at 0 when a player is recreated, the epoch tells the queues apart
+        self.epoch: str = epoch or token_hex(4)
+
+        # Called after every mutation
+        self.listener: Optional[Callable[[], None]] = None
+
+    @property
+    def stamp(self) -> str:
+        """
+        The version of the queue along with its epoch, which differs between any two states of any two queues.
+        """
+        return f"{self.epoch}.{self.version}"
+
+    def _changed(self) -> None:
+        self.version += 1
+
+        if self.listener:
+            self.listener()
+
+    def append(self, track: AudioTrack) -> None:
+        super().append(track)
+        self._changed()
+
+    def extend(self, tracks: Iterable[AudioTrack]) -> None:
+        super().extend(tracks)
+        self._changed()
+
+    def insert(self, index: SupportsIndex, track: AudioTrack) -> None:
+        super().insert(index, track)
+        self._changed()
+
+    def pop(self, index: SupportsIndex = -1) -> AudioTrack:
+        track = super().pop(index)
+        self._changed()
+
+        return track
+
+    def remove(self, track: AudioTrack) -> None:
+        super().remove(track)
+        self._changed()
+
+    def clear(self) -> None:
+        super().clear()
+        self._changed()
+
+    def sort(self, *args: Any, **kwargs: Any) -> None:
+        super().sort(*args, **kwargs)
+        self._changed()
+
+    def reverse(self) -> None:
+        super().reverse()
+        self._changed()
+
+    def __setitem__(self, index: Union[SupportsIndex, slice], value: Any) -> None:
+        super().__setitem__(index, value)
+        self._changed()
+
+    def __delitem__(self, index: Union[SupportsIndex, slice]) -> None:
+        super().__delitem__(index)
+        self._changed()
+
+    def __iadd__(self, tracks: Iterable[AudioTrack]) -> "TrackQueue":
+        super().__iadd__(tracks)
+        self._changed()
+
+        return self
+
+    def __imul__(self, count: SupportsIndex) -> "TrackQueue":
+        super().__imul__(count)
+        self._changed()
+
+        return self
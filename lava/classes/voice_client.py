@@ -73,6 +73,9 @@ class LavalinkVoiceClient(VoiceClient):
 
         await self.channel.guild.change_voice_state(channel=None)
 
+        player.cancel_ingestions()
+        player.cancel_lookahead()
+
         await player.stop()
         await player.update_display()
 
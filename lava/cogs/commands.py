@@ -4,24 +4,12 @@ from disnake import ApplicationCommandInteraction, Embed
 from disnake.ext import commands
 from disnake.ext.commands import Cog
 from lavalink import Timescale, Tremolo, Vibrato, LowPass, Rotation, Equalizer
-from psutil import cpu_percent, virtual_memory, Process
+from psutil import Process
 
 from lava.bot import Bot
 from lava.embeds import InfoEmbed
-from lava.utils import bytes_to_gb, get_commit_hash, get_upstream_url, \
-    get_current_branch
-from os import getpid
-
-from disnake import ApplicationCommandInteraction, Embed
-from disnake.ext import commands
-from disnake.ext.commands import Cog
-from lavalink import Timescale, Tremolo, Vibrato, LowPass, Rotation, Equalizer
-from psutil import cpu_percent, virtual_memory, Process
-
-from lava.bot import Bot
-from lava.embeds import InfoEmbed
-from lava.utils import bytes_to_gb, get_commit_hash, get_upstream_url, \
-    get_current_branch
+from lava.metrics import version_info, system_sampler
+from lava.utils import bytes_to_gb
 
 allowed_filters = {
     "timescale": Timescale,
@@ -53,27 +41,28 @@ class Commands(Cog):
             inline=True
         )
 
-        branch = get_current_branch()
-        upstream_url = get_upstream_url(branch)
+        commit_hash, branch, upstream_url = version_info()
 
         embed.add_field(
             name='版本資訊',
-            value=f"{get_commit_hash()} on {branch} from {upstream_url}",
+            value=f"{commit_hash} on {branch} from {upstream_url}",
         )
 
         embed.add_field(name="​", value="​", inline=True)
 
         embed.add_field(
             name='CPU',
-            value=f"{cpu_percent()}%",
+            value=f"{system_sampler.cpu_percent}%",
             inline=True
         )
 
+        memory = system_sampler.memory
+
         embed.add_field(
             name='RAM',
-            value=f"{round(bytes_to_gb(virtual_memory()[3]), 1)} GB / "
-                  f"{round(bytes_to_gb(virtual_memory()[0]), 1)} GB "
-                  f"({virtual_memory()[2]}%)",
+            value=f"{round(bytes_to_gb(memory.used), 1)} GB / "
+                  f"{round(bytes_to_gb(memory.total), 1)} GB "
+                  f"({memory.percent}%)",
             inline=True
         )
 
@@ -102,10 +91,13 @@ class Commands(Cog):
         description="查看機器人延遲"
     )
     async def ping(self, interaction: ApplicationCommandInteraction):
+        kava_latency = self.bot.kava_client.latency
+
         await interaction.response.send_message(
             embed=InfoEmbed(
                 title="機器人延遲",
-                description=f"{round(self.bot.latency * 1000)}ms"
+                description=f"Discord：{round(self.bot.latency * 1000)}ms\n"
+                            f"Krabbe：{f'{round(kava_latency * 1000)}ms' if kava_latency is not None else '未知'}"
             )
         )
 
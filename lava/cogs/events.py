@@ -1,15 +1,19 @@
 from logging import getLogger
+from typing import Union
 
 from disnake import MessageInteraction
 from disnake.ext import commands
 from disnake.ext.commands import Cog, CommandInvokeError
-from lavalink import TrackEndEvent, TrackLoadFailedEvent, QueueEndEvent, TrackStartEvent, PlayerUpdateEvent
+from lavalink import TrackEndEvent, TrackLoadFailedEvent, QueueEndEvent, TrackStartEvent, PlayerUpdateEvent, \
+    TrackExceptionEvent, TrackStuckEvent
 
 from lava.bot import Bot
 from lava.classes.player import LavaPlayer
 from lava.embeds import ErrorEmbed
-from lava.errors import MissingVoicePermissions, BotNotInVoice, UserNotInVoice, UserInDifferentChannel
+from lava.errors import MissingVoicePermissions, BotNotInVoice, UserNotInVoice, UserInDifferentChannel, \
+    RequestTimedOut, ConnectionLost, RequestBufferFull
 from lava.krabbe.utils import can_use_music
+from lava.source import SpotifyAudioTrack
 from lava.utils import ensure_voice
 
 
@@ -28,6 +32,8 @@ class Events(Cog):
         self.bot.lavalink.add_event_hook(self.on_track_end, event=TrackEndEvent)
         self.bot.lavalink.add_event_hook(self.on_queue_end, event=QueueEndEvent)
         self.bot.lavalink.add_event_hook(self.on_track_load_failed, event=TrackLoadFailedEvent)
+        self.bot.lavalink.add_event_hook(self.on_track_exception, event=TrackExceptionEvent)
+        self.bot.lavalink.add_event_hook(self.on_track_exception, event=TrackStuckEvent)
 
     async def on_player_update(self, event: PlayerUpdateEvent):
         player: LavaPlayer = event.player
@@ -58,6 +64,12 @@ class Events(Cog):
 
         await player.guild.voice_client.disconnect(force=False)
 
+    async def on_track_exception(self, event: Union[TrackExceptionEvent, TrackStuckEvent]):
+        if isinstance(event.track, SpotifyAudioTrack):
+            self.bot.logger.info("Spotify track %s failed to play, invalidating its resolution", event.track.title)
+
+            await event.track.invalidate_resolution()
+
     async def on_track_load_failed(self, event: TrackLoadFailedEvent):
         player: LavaPlayer = event.player
 
@@ -104,7 +116,18 @@ class Events(Cog):
         except (UserNotInVoice, BotNotInVoice, MissingVoicePermissions, UserInDifferentChannel):
             return
 
-        if not await can_use_music(self.bot.kava_client, interaction.author.id, interaction.author.voice.channel.id):
+        try:
+            allowed = await can_use_music(
+                self.bot.kava_client, interaction.author.id, interaction.author.voice.channel.id
+            )
+        except (RequestTimedOut, ConnectionLost, RequestBufferFull):
+            await interaction.response.send_message(
+                embed=ErrorEmbed("無法確認音樂使用權限，請稍後再試"),
+                ephemeral=True
+            )
+            return
+
+        if not allowed:
             await interaction.response.send_message(
                 embed=ErrorEmbed("此語音頻道擁有者不允許其他成員使用音樂功能"),
                 ephemeral=True
@@ -113,6 +136,23 @@ class Events(Cog):
 
         player = self.bot.lavalink.player_manager.get(interaction.guild_id)
 
+        if interaction.data.custom_id == "control.next":
+            # Presses of the skip button waiting for the same player are collapsed into a single skip
+            await self.bot.guild_executor.run_merged(
+                interaction.guild_id, "control.next", player.skip_tracks
+            )
+        else:
+            await self.bot.guild_executor.run(
+                interaction.guild_id, lambda: self.control_player(interaction, player)
+            )
+
+        await player.update_display(interaction=interaction)
+
+    @staticmethod
+    async def control_player(interaction: MessageInteraction, player: LavaPlayer):
+        """
+        Apply the control button pressed in an interaction to the player, this should run through the guild executor.
+        """
         match interaction.data.custom_id:
             case "control.resume":
                 await player.set_pause(False)
@@ -128,9 +168,6 @@ class Events(Cog):
             case "control.previous":
                 await player.seek(0)
 
-            case "control.next":
-                await player.skip()
-
             case "control.shuffle":
                 player.set_shuffle(not player.shuffle)
 
@@ -143,8 +180,6 @@ class Events(Cog):
             case "control.forward":
                 await player.seek(round(player.position) + 10000)
 
-        await player.update_display(interaction=interaction)
-
 
 def setup(bot):
     bot.add_cog(Events(bot))
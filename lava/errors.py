@@ -22,3 +22,27 @@ class UserInDifferentChannel(Exception):
 
 class LoadError(Exception):
     pass
+
+
+class RequestBufferFull(Exception):
+    pass
+
+
+class RequestTimedOut(Exception):
+    pass
+
+
+class ConnectionLost(Exception):
+    pass
+
+
+class RequestExpired(Exception):
+    pass
+
+
+class SpotifyError(Exception):
+    pass
+
+
+class BilibiliError(Exception):
+    pass
@@ -0,0 +1,178 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from logging import getLogger
+from time import time
+from typing import Optional, Dict, Any
+from urllib.parse import urlparse, parse_qs
+
+from yt_dlp import YoutubeDL
+from yt_dlp.utils import UnsupportedError, DownloadError
+
+from lava.cache import SingleFlightCache
+
+# Query parameters signed stream urls carry their expiry timestamp in,
+# e.g. googlevideo uses "expire" and Bilibili "deadline"
+EXPIRY_PARAMETERS = ("expire", "expires", "Expires", "deadline")
+
+# The YoutubeDL of the current worker process
+_ytdl: Optional[YoutubeDL] = None
+
+
+def _init_worker(options: Dict[str, Any]) -> None:
+    global _ytdl  # skipcq: PYL-W0603
+
+    _ytdl = YoutubeDL(options)
+
+
+def _extract(url: str) -> Optional[Dict[str, Any]]:
+    """
+    Extract the playable stream of an url, this runs in a worker process.
+    Only the fields the bot needs are returned, so little has to be sent back to the bot's process.
+    :param url: The url to extract.
+    :return: The title, webpage url and stream url, None if the url isn't supported.
+    """
+    try:
+        info = _ytdl.extract_info(url, download=False)
+
+        if 'entries' in info:
+            info = info['entries'][0]
+
+        return {
+            "title": info['title'],
+            "webpage_url": info['webpage_url'],
+            "url": info['formats'][-1]['url']
+        }
+
+    except (UnsupportedError, DownloadError, KeyError, IndexError):
+        return None
+
+
+def stream_expiry(url: str) -> Optional[float]:
+    """
+    Get the expiry timestamp of a signed stream url.
+    :param url: The stream url.
+    :return: The unix timestamp the url expires at, None if it doesn't say.
+    """
+    parameters = parse_qs(urlparse(url).query)
+
+    for name in EXPIRY_PARAMETERS:
+        try:
+            return float(parameters[name][0])
+        except (KeyError, ValueError):
+            continue
+
+    return None
+
+
+class Extractor:
+    """
+    Runs yt-dlp extractions in a pool of worker processes, each with its own YoutubeDL, so they don't block the
+    event loop. Results are cached until their stream url expires, and concurrent extractions of the same url
+    share a single job.
+    """
+
+    def __init__(self, options: Dict[str, Any], max_workers: int = 2, timeout: float = 20.0,
+                 maxsize: int = 512, default_ttl: float = 30 * 60, negative_ttl: float = 60.0,
+                 expiry_margin: float = 60.0):
+        """
+        :param options: The options of the YoutubeDL of each worker.
+        :param max_workers: The amount of worker processes.
+        :param timeout: How many seconds an extraction may take before it's given up on.
+        :param maxsize: The max amount of cached results.
+        :param default_ttl: How many seconds a result whose stream url doesn't say when it expires is cached for.
+        :param negative_ttl: How many seconds a failed extraction is cached for.
+        :param expiry_margin: How many seconds before its stream url expires a result stops being served.
+        """
+        self.options = {**options, "socket_timeout": timeout}
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.default_ttl = default_ttl
+        self.negative_ttl = negative_ttl
+        self.expiry_margin = expiry_margin
+
+        self.results: SingleFlightCache[str, Optional[Dict[str, Any]]] = SingleFlightCache(
+            maxsize, default_ttl, self._ttl_of
+        )
+
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+        self.logger = getLogger("lava.extraction")
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # Spawned rather than forked, forking a process running an event loop and threads isn't safe
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.options,)
+            )
+
+        return self._pool
+
+    def _ttl_of(self, _: str, result: Optional[Dict[str, Any]]) -> float:
+        if result is None:
+            return self.negative_ttl
+
+        if (expiry := stream_expiry(result['url'])) is None:
+            return self.default_ttl
+
+        return max(0.0, expiry - time() - self.expiry_margin)
+
+    def _terminate_pool(self, pool: ProcessPoolExecutor) -> None:
+        """
+        Kill the workers of a pool, so a hung extraction can't hold one forever. The next job starts a new pool.
+        :param pool: The pool to terminate.
+        """
+        # Shutting down forgets the processes, so they have to be taken first
+        processes = list((pool._processes or {}).values())  # skipcq: PYL-W0212
+
+        pool.shutdown(wait=False, cancel_futures=True)
+
+        for process in processes:
+            process.terminate()
+
+        if self._pool is pool:
+            self._pool = None
+
+    async def _run(self, url: str) -> Optional[Dict[str, Any]]:
+        pool = self.pool
+        future = asyncio.get_running_loop().run_in_executor(pool, _extract, url)
+
+        try:
+            return await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            # Cancelling the future doesn't stop a running job, the worker stays stuck on it
+            self._terminate_pool(pool)
+            raise
+        except BrokenProcessPool:
+            if self._pool is pool:
+                self._pool = None
+            raise
+
+    async def extract(self, url: str) -> Optional[Dict[str, Any]]:
+        """
+        Extract the playable stream of an url.
+        :param url: The url to extract.
+        :return: A dict with the title, webpage url and stream url, None if the url isn't supported or timed out.
+        """
+        try:
+            # Timeouts and dead workers raise out of the job instead, so they aren't cached like unsupported urls
+            return await self.results.load(url, partial(self._run, url))
+        except asyncio.TimeoutError:
+            self.logger.warning("Extraction of %s timed out after %s seconds", url, self.timeout)
+            return None
+        except BrokenProcessPool:
+            self.logger.exception("A worker died while extracting %s, restarting the pool", url)
+            return None
+
+    def close(self) -> None:
+        self.results.close()
+
+        if self._pool:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,31 @@
+from typing import Optional, Any
+
+import aiohttp
+
+
+class LazySession:
+    """
+    A pooled HTTP session, created on first use as it needs a running event loop, and created again if it was closed.
+    """
+
+    def __init__(self, limit: int = 100, **kwargs: Any):
+        """
+        :param limit: The max amount of connections open at once.
+        :param kwargs: The keyword arguments of the aiohttp.ClientSession, e.g. timeout or headers.
+        """
+        self.limit = limit
+        self.kwargs = kwargs
+
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.limit), **self.kwargs)
+
+        return self._session
+
+    async def close(self) -> None:
+        if self._session:
+            await self._session.close()
+            self._session = None
@@ -0,0 +1,145 @@
+import asyncio
+from typing import TYPE_CHECKING, Optional, List, Dict, Hashable
+
+from lavalink import LoadType
+
+from lava.cache import TTLCache
+from lava.metrics import autocomplete_lookups
+
+if TYPE_CHECKING:
+    from lava.bot import Bot
+
+Choices = List[Dict[str, str]]
+
+
+class AutocompletePipeline:
+    """
+    Serves search suggestions for autocomplete, which asks on every keystroke.
+
+    Results are cached by query, and a query extending a cached one is answered by narrowing down the cached results
+    when enough of them still match. Searches are debounced, a newer query from the same session supersedes the older
+    one, and a search nobody waits for anymore is dropped. Searches share a global concurrency cap, so typing bursts
+    can't flood Lavalink.
+    """
+
+    def __init__(self, bot: "Bot", concurrency: int = 4, maxsize: int = 1024, ttl: float = 10 * 60,
+                 min_narrowed_results: int = 5, debounce: float = 0.15):
+        """
+        :param bot: The bot.
+        :param concurrency: The max amount of searches running on Lavalink at once.
+        :param maxsize: The max amount of cached queries.
+        :param ttl: How many seconds the results of a query are cached for.
+        :param min_narrowed_results: The min amount of cached results that have to match an extended query
+                                     for them to be served instead of searching.
+        :param debounce: How many seconds a search waits before it's sent, so one superseded by the next keystroke
+                         by then is dropped without reaching Lavalink.
+        """
+        self.bot = bot
+        self.min_narrowed_results = min_narrowed_results
+        self.debounce = debounce
+
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.cache: TTLCache[str, Choices] = TTLCache(maxsize, ttl)
+
+        self.searches: Dict[str, asyncio.Task] = {}
+        self.waiters: Dict[str, int] = {}
+
+        # Session -> a future resolved once a newer query from the session arrives
+        self.sessions: Dict[Hashable, asyncio.Future] = {}
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        return " ".join(query.lower().split())
+
+    def _narrow(self, key: str) -> Optional[Choices]:
+        """
+        Answer a query from the cached results of the longest cached query it extends.
+        :param key: The normalized query.
+        :return: The cached results matching every term of the query, None if too few of them match.
+        """
+        terms = key.split()
+
+        for length in range(len(key) - 1, 0, -1):
+            if (cached := self.cache.get(key[:length], count=False)) is None:
+                continue
+
+            narrowed = [choice for choice in cached if all(term in choice["name"].lower() for term in terms)]
+
+            return narrowed if len(narrowed) >= self.min_narrowed_results else None
+
+        return None
+
+    async def _search(self, key: str) -> Choices:
+        try:
+            await asyncio.sleep(self.debounce)
+
+            async with self.semaphore:
+                result = await self.bot.lavalink.get_tracks(f"ytsearch:{key}")
+
+            choices = [
+                {
+                    "name": f"{track.title[:80]} by {track.author[:16]}",
+                    "value": track.uri
+                }
+                for track in result.tracks
+            ]
+
+            # A failed search isn't cached, it would answer the query and those extending it with nothing for the ttl
+            if result.load_type != LoadType.ERROR:
+                self.cache.set(key, choices)
+
+            return choices
+        finally:
+            self.searches.pop(key, None)
+
+    async def search(self, query: str, session: Optional[Hashable] = None) -> Optional[Choices]:
+        """
+        Get the search suggestions for a query.
+        :param query: The query.
+        :param session: The session the query belongs to, e.g. the user typing it. None to never be superseded.
+        :return: The suggestions, None if a newer query from the same session superseded this one.
+        """
+        key = self.normalize(query)
+
+        if (cached := self.cache.get(key)) is not None:
+            autocomplete_lookups.inc(result="cache")
+            return cached
+
+        if (narrowed := self._narrow(key)) is not None:
+            autocomplete_lookups.inc(result="narrowed")
+            return narrowed
+
+        superseded: Optional[asyncio.Future] = None
+
+        if session is not None:
+            if (previous := self.sessions.get(session)) and not previous.done():
+                previous.set_result(None)
+
+            superseded = self.sessions[session] = asyncio.get_running_loop().create_future()
+
+        if key not in self.searches:
+            self.searches[key] = asyncio.get_running_loop().create_task(self._search(key))
+
+        task = self.searches[key]
+        self.waiters[key] = self.waiters.get(key, 0) + 1
+
+        try:
+            await asyncio.wait({task, superseded} if superseded else {task}, return_when=asyncio.FIRST_COMPLETED)
+
+            if not task.done():
+                autocomplete_lookups.inc(result="superseded")
+                return None
+
+            autocomplete_lookups.inc(result="search")
+            return task.result()
+        finally:
+            self.waiters[key] -= 1
+
+            if not self.waiters[key]:
+                del self.waiters[key]
+
+                if not task.done():  # Nobody is waiting for it anymore
+                    task.cancel()
+
+            if session is not None and self.sessions.get(session) is superseded:
+                del self.sessions[session]
@@ -1,93 +1,764 @@
-import json
+import asyncio
+import itertools
+import random
 import uuid
-from asyncio import Future
-from typing import Optional, Dict, Callable, Any, Coroutine, TYPE_CHECKING, List, Union
+from asyncio import Future, Task
+from collections import deque
+from time import monotonic, perf_counter
+from typing import Optional, Dict, Callable, Any, Coroutine, TYPE_CHECKING, List, Union, Deque, Awaitable, TypeVar, \
+    Tuple, Hashable
 
 import websockets
 from websockets import WebSocketClientProtocol
 
+from lava.cache import TTLCache
+from lava.errors import RequestBufferFull, RequestTimedOut, ConnectionLost, RequestExpired
+from lava.krabbe.codec import Codec, JsonCodec, available_codecs, get_codec
+from lava.krabbe.dispatcher import PriorityDispatcher
+from lava.krabbe.idempotency import ResponseStore, MUTATING_ENDPOINTS
+from lava.metrics import kava_request_seconds, kava_handler_seconds, kava_heartbeat_rtt_seconds
+
 if TYPE_CHECKING:
     from lava.bot import Bot
 
+T = TypeVar("T")
+
 
 class Request:
-    def __init__(self, client: 'KavaClient', request_id: str, data: Dict[str, Any]):
+    def __init__(self, client: 'KavaClient', request_id: Union[str, int], data: Dict[str, Any],
+                 timeout: Optional[float] = None, endpoint: Optional[str] = None):
+        """
+        :param client: The client that received this request.
+        :param request_id: The ID of this request.
+        :param data: The data of this request.
+        :param timeout: How many seconds the caller is willing to wait for a response, None if it waits forever.
+        :param endpoint: The endpoint this request was made to.
+        """
         self.client = client
         self.id = request_id
         self.data = data
+        self.endpoint = endpoint
+        self.idempotency_key: Optional[Hashable] = None
+        self.responded: bool = False
+        self.deadline: Optional[float] = monotonic() + timeout if timeout is not None else None
+
+    @property
+    def remaining(self) -> Optional[float]:
+        """
+        Seconds left until the caller gives up on this request, None if there's no deadline.
+        """
+        if self.deadline is None:
+            return None
+
+        return max(0.0, self.deadline - monotonic())
+
+    @property
+    def expired(self) -> bool:
+        """
+        Whether the caller has already given up on this request.
+        """
+        return self.deadline is not None and monotonic() >= self.deadline
+
+    async def within_deadline(self, awaitable: Awaitable[T]) -> T:
+        """
+        Await something, cancelling it once the deadline of this request has passed.
+        :param awaitable: The awaitable to wait for.
+        :return: The result of the awaitable.
+        :raise RequestExpired: If the deadline passed before the awaitable finished.
+        """
+        if self.deadline is None:
+            return await awaitable
+
+        try:
+            return await asyncio.wait_for(awaitable, self.remaining)
+        except asyncio.TimeoutError as error:
+            raise RequestExpired(f"Request {self.id} expired") from error
 
     async def respond(self, response_data: Dict[str, Any]) -> None:
+        self.responded = True
+
         response = {
             "type": "response",
             "id": self.id,
             "data": response_data
         }
 
-        await self.client.websocket.send(json.dumps(response))
+        encoded: Optional[Union[str, bytes]] = None
+        duplicates: List["Request"] = []
+
+        if self.idempotency_key is not None:  # Only the first response is stored and replayed
+            key, self.idempotency_key = self.idempotency_key, None
+
+            # Weighed by its size on the wire, the encoded response is then sent as is
+            encoded = self.client.codec.encode(response)
+            duplicates = self.client.responses.complete(key, self, response_data, len(encoded))
+
+        if self.expired:
+            self.client.bot.logger.debug("Not responding to request %s as its deadline has passed", self.id)
+        else:
+            await self.client.send(response, buffer=False, encoded=encoded)
+
+        for duplicate in duplicates:
+            await duplicate.respond(response_data)
+
+    async def respond_busy(self) -> None:
+        """
+        Tell the caller the bot is too busy to handle this request. The response isn't stored, so a retry runs again.
+        """
+        if self.idempotency_key is not None:
+            self.client.responses.abandon(self.idempotency_key, self)
+            self.idempotency_key = None
+
+        await self.respond({"status": "error", "busy": True, "message": "機器人目前忙碌中，請稍後再試。"})
 
 
 class KavaClient:
-    def __init__(self, bot: "Bot", uri: str):
+    default_endpoint_timeouts: Dict[str, float] = {
+        "can_use_music": 2.0
+    }
+
+    def __init__(self, bot: "Bot", uri: str,
+                 buffer_size: int = 256, min_backoff: float = 0.25, max_backoff: float = 30.0,
+                 default_timeout: float = 10.0, endpoint_timeouts: Optional[Dict[str, float]] = None,
+                 compression_threshold: Optional[int] = 4096, negotiation_timeout: float = 1.0,
+                 batch_window: Optional[float] = None, batch_size: int = 64,
+                 dispatcher: Optional[PriorityDispatcher] = None, permission_ttl: float = 15.0,
+                 heartbeat_interval: float = 10.0, max_missed_heartbeats: int = 3,
+                 responses: Optional[ResponseStore] = None, stable_period: float = 30.0):
+        """
+        :param bot: The bot this client belongs to.
+        :param uri: The URI of the Kava server.
+        :param buffer_size: The max amount of outbound requests to hold while the connection is down.
+        :param min_backoff: The base delay in seconds between reconnect attempts.
+        :param max_backoff: The max delay in seconds between reconnect attempts.
+        :param default_timeout: How many seconds to wait for a response before giving up on a request.
+        :param endpoint_timeouts: Per-endpoint overrides of default_timeout.
+        :param compression_threshold: Ask the server to compress frames larger than this amount of bytes,
+            None to disable compression.
+        :param negotiation_timeout: How many seconds to wait for the server to answer the codec negotiation
+            before falling back to JSON.
+        :param batch_window: Opt into batching, sending messages queued within this many seconds as a single
+            array frame if the server supports it. None to send every message on its own.
+        :param batch_size: The max amount of messages in a batch, a full batch is sent right away.
+        :param dispatcher: The dispatcher to run incoming requests on, a default one is used if not provided.
+        :param permission_ttl: How many seconds a can_use_music decision is cached for.
+        :param heartbeat_interval: How many seconds to wait between heartbeats, and for each heartbeat to be answered.
+        :param max_missed_heartbeats: The amount of consecutive unanswered heartbeats after which the connection
+            is considered dead and re-established.
+        :param responses: The store of recent responses replayed to retried requests, a default one is used
+            if not provided.
+        :param stable_period: How many seconds a connection has to stay up for the reconnect backoff to start over.
+        """
         self.bot: "Bot" = bot
         self.uri = uri
         self.websocket: Optional[WebSocketClientProtocol] = None
-        self.pending_requests: Dict[str, Future] = {}
+        self.pending_requests: Dict[Union[str, int], Future] = {}
         self.handlers: Dict[str, List[Callable[..., Coroutine[Any, Any, None]]]] = {}
 
+        self.buffer_size = buffer_size
+        self.outbound_buffer: Deque[Dict[str, Any]] = deque()
+
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.stable_period = stable_period
+
+        self.default_timeout = default_timeout
+        self.endpoint_timeouts: Dict[str, float] = {**self.default_endpoint_timeouts, **(endpoint_timeouts or {})}
+
+        self.compression_threshold = compression_threshold
+        self.negotiation_timeout = negotiation_timeout
+
+        self.codec: Codec = JsonCodec()
+        self.compact_ids: bool = False
+        self._request_ids = itertools.count(1)
+
+        self.batch_window = batch_window
+        self.batch_size = batch_size
+        self.batching: bool = False
+        self._outbox: List[Dict[str, Any]] = []
+        self._outbox_timer: Optional[Task] = None
+
+        self.dispatcher = dispatcher or PriorityDispatcher()
+
+        self.permission_cache: TTLCache[Tuple[int, int], bool] = TTLCache(maxsize=4096, ttl=permission_ttl)
+
+        self.heartbeat_interval = heartbeat_interval
+        self.max_missed_heartbeats = max_missed_heartbeats
+        self.app_heartbeat: bool = False
+        self.rtt_samples: Deque[float] = deque(maxlen=50)
+        self.last_frame_at: Optional[float] = None
+        self._pings: Dict[int, Future] = {}
+        self._ping_ids = itertools.count(1)
+
+        self.responses = responses or ResponseStore()
+
+        # The session the Kava server announced in its hello, None if it didn't
+        self.session_id: Optional[Hashable] = None
+
+        self._ready: bool = False
+        self._closing: bool = False
+        self._supervisor: Optional[Task] = None
+
+    @property
+    def latency(self) -> Optional[float]:
+        """
+        The median round trip time in seconds of the recent heartbeats, None if there are none yet.
+        """
+        if not self.rtt_samples:
+            return None
+
+        return sorted(self.rtt_samples)[len(self.rtt_samples) // 2]
+
+    @property
+    def connected(self) -> bool:
+        """
+        Whether the connection is established and the outbound buffer has been flushed.
+        """
+        return self._ready and self.websocket is not None and self.websocket.open
+
+    def _backoff(self, attempt: int) -> float:
+        """
+        Get the delay before the next reconnect attempt, using exponential backoff with full jitter.
+        :param attempt: The amount of consecutive failed attempts.
+        :return: The delay in seconds.
+        """
+        return random.uniform(0, min(self.max_backoff, self.min_backoff * 2 ** attempt))
+
+    async def _supervise(self) -> None:
+        """
+        Keep the connection to the Kava server alive, reconnecting with backoff whenever it drops.
+        """
+        attempt = 0
+
+        while not self._closing:
+            try:
+                self.websocket = await websockets.connect(self.uri)
+            except (OSError, asyncio.TimeoutError, websockets.InvalidHandshake, websockets.InvalidURI) as error:
+                delay = self._backoff(attempt)
+                attempt += 1
+
+                self.bot.logger.warning(
+                    "Failed to connect to Kava server (%s), retrying in %.2f seconds...", error, delay
+                )
+
+                await asyncio.sleep(delay)
+                continue
+            except Exception:  # skipcq: PYL-W0703
+                delay = self._backoff(attempt)
+                attempt += 1
+
+                self.bot.logger.exception(
+                    "Unexpected error connecting to Kava server, retrying in %.2f seconds...", delay
+                )
+
+                await asyncio.sleep(delay)
+                continue
+
+            connected_at = self.bot.loop.time()
+
+            try:
+                await self._run_connection()
+            except Exception:  # skipcq: PYL-W0703
+                # Whatever went wrong, the supervisor has to survive it or the bot never reconnects
+                self.bot.logger.exception("Unexpected error on the connection to Kava server, reconnecting...")
+
+                self.websocket.transport.abort()
+
+            self._ready = False
+            self.websocket = None
+
+            self._fail_sent_requests()
+
+            if not self._closing:
+                # A server accepting connections only to drop them right away is backed off like a refused one
+                if self.bot.loop.time() - connected_at >= self.stable_period:
+                    attempt = 0
+
+                delay = self._backoff(attempt)
+                attempt += 1
+
+                self.bot.logger.warning("Lost connection to Kava server, reconnecting in %.2f seconds...", delay)
+
+                await asyncio.sleep(delay)
+
+    def _fail_sent_requests(self) -> None:
+        """
+        Fail the pending requests that were already sent, as their responses will never arrive on a new connection.
+        Requests that are still in the outbound buffer are kept.
+        """
+        buffered = {message['id'] for message in self.outbound_buffer}
+
+        for request_id in [request_id for request_id in self.pending_requests if request_id not in buffered]:
+            future = self.pending_requests.pop(request_id)
+
+            if not future.done():
+                future.set_exception(ConnectionLost("Lost connection to Kava server before receiving a response."))
+
+    async def _negotiate(self) -> Optional[Union[str, bytes]]:
+        """
+        Negotiate the wire codec with the server. Servers that don't answer the hello in time get plain JSON,
+        as they predate codec negotiation.
+        :return: The first message of the server if it wasn't its hello, to be handled once the client is ready.
+        """
+        self.codec = JsonCodec()
+        self.compact_ids = False
+        self.batching = False
+        self.app_heartbeat = False
+        self.session_id = None
+
+        await self.websocket.send(
+            JsonCodec().encode(
+                {
+                    "type": "hello",
+                    "codecs": list(available_codecs()),
+                    "compression_threshold": self.compression_threshold,
+                    "compact_ids": True,
+                    "batching": self.batch_window is not None,
+                    "heartbeat": True
+                }
+            )
+        )
+
+        try:
+            message = await asyncio.wait_for(self.websocket.recv(), self.negotiation_timeout)
+        except asyncio.TimeoutError:
+            self.bot.logger.info("Kava server did not negotiate a codec, falling back to JSON")
+            return None
+
+        try:
+            data = JsonCodec().decode(message)
+        except Exception:  # skipcq: PYL-W0703
+            data = None
+
+        if not isinstance(data, dict) or data.get('type') != "hello":
+            self.bot.logger.info("Kava server did not negotiate a codec, falling back to JSON")
+
+            return message
+
+        self.session_id = data.get('session')
+
+        try:
+            self.codec = get_codec(data.get('codec', "json"), data.get('compression_threshold'))
+        except ValueError:
+            self.bot.logger.warning("Kava server chose unknown codec %s, falling back to JSON", data.get('codec'))
+            return None
+
+        self.compact_ids = bool(data.get('compact_ids', False))
+        self.batching = self.batch_window is not None and bool(data.get('batching', False))
+        self.app_heartbeat = bool(data.get('heartbeat', False))
+
+        self.bot.logger.info(
+            "Negotiated codec %s with Kava server%s", self.codec.name, " with batching" if self.batching else ""
+        )
+
+        return None
+
+    async def _ping(self) -> None:
+        """
+        Send a heartbeat and wait for it to be answered. Servers that don't support application heartbeats
+        are pinged at the websocket level instead.
+        """
+        if not self.app_heartbeat:
+            await (await self.websocket.ping())
+            return
+
+        ping_id = next(self._ping_ids)
+        self._pings[ping_id] = future = Future()
+
+        try:
+            await self.send({"type": "ping", "id": ping_id}, buffer=False)
+            await future
+        finally:
+            self._pings.pop(ping_id, None)
+
+    async def _heartbeat(self) -> None:
+        """
+        Keep track of the round trip time to the Kava server, and tear the connection down once enough heartbeats
+        go unanswered, so a half-open connection gets re-established instead of silently swallowing requests.
+        """
+        missed = 0
+
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+
+            start = monotonic()
+
+            try:
+                await asyncio.wait_for(self._ping(), self.heartbeat_interval)
+            except (asyncio.TimeoutError, websockets.ConnectionClosed):
+                missed += 1
+
+                self.bot.logger.warning(
+                    "Kava server missed a heartbeat (%d / %d)", missed, self.max_missed_heartbeats
+                )
+
+                if missed >= self.max_missed_heartbeats:
+                    self.bot.logger.warning("Kava server stopped answering heartbeats, reconnecting...")
+
+                    # Abort instead of closing, a closing handshake would wait on the dead peer
+                    self.websocket.transport.abort()
+                    return
+
+                continue
+
+            missed = 0
+
+            rtt = monotonic() - start
+
+            self.rtt_samples.append(rtt)
+            kava_heartbeat_rtt_seconds.observe(rtt)
+
+    def _next_request_id(self) -> Union[str, int]:
+        """
+        Get an ID for a new outgoing request, a compact integer if the server supports it.
+        """
+        if self.compact_ids:
+            return next(self._request_ids)
+
+        return str(uuid.uuid4())
+
+    async def _flush_buffer(self) -> None:
+        """
+        Send the requests buffered while the connection was down, in the order they were made.
+        """
+        if self.outbound_buffer:
+            self.bot.logger.info("Flushing %d buffered requests to Kava server...", len(self.outbound_buffer))
+
+        while self.outbound_buffer:
+            # Taken off before sending, a request timing out meanwhile removes its message from the buffer
+            message = self.outbound_buffer.popleft()
+
+            try:
+                await self.websocket.send(self.codec.encode(message))
+            except websockets.ConnectionClosed:
+                if message['type'] != "request" or message['id'] in self.pending_requests:
+                    self.outbound_buffer.appendleft(message)
+
+                return
+
+        self._ready = True
+
+    async def _run_connection(self) -> None:
+        """
+        Negotiate, flush the buffered requests and handle the incoming messages until the connection drops.
+        """
+        previous_session_id = self.session_id
+        early_message: Optional[Union[str, bytes]] = None
+
+        try:
+            early_message = await self._negotiate()
+        except websockets.ConnectionClosed:
+            pass
+
+        if self.session_id is None or self.session_id != previous_session_id:
+            # A new session may reuse idempotency keys, its requests mustn't get the responses of the old one
+            self.responses.clear()
+
+        await self._flush_buffer()
+
+        if early_message is not None:
+            # Handled only now, its response would have been dropped while the client wasn't ready
+            try:
+                self._handle_message(early_message)
+            except Exception:  # skipcq: PYL-W0703
+                self.bot.logger.exception("Failed to handle a message from Kava server, dropping it")
+
+        heartbeat = self.bot.loop.create_task(self._heartbeat())
+
+        try:
+            await self._handle_connection()
+        finally:
+            heartbeat.cancel()
+
     async def _handle_connection(self) -> None:
         self.bot.logger.info("Connection to Kava server established.")
 
         try:
             async for message in self.websocket:
-                _ = self.bot.loop.create_task(self._handle_message(message))
+                self.last_frame_at = monotonic()
+
+                try:
+                    self._handle_message(message)
+                except Exception:  # skipcq: PYL-W0703
+                    # A malformed frame is dropped, it mustn't take the connection down with it
+                    self.bot.logger.exception("Failed to handle a message from Kava server, dropping it")
         except websockets.ConnectionClosed:
-            await self.close()
-            # TODO: try reconnecting.
-            # TODO: Don't do it here, try modifying the connect function to auto retry connecting and calls it here.
+            pass
+
+    def _handle_message(self, message: Union[str, bytes]) -> None:
+        data = self.codec.decode(message)
 
-    async def _handle_message(self, message: Union[str, bytes]) -> None:
-        data = json.loads(message)
+        if isinstance(data, list):  # A batch of messages
+            for item in data:
+                try:
+                    self._dispatch_message(item)
+                except Exception:  # skipcq: PYL-W0703
+                    self.bot.logger.exception("Failed to handle a batched message from Kava server, dropping it")
+        else:
+            self._dispatch_message(data)
+
+    def _dispatch_message(self, data: Any) -> None:
+        if not isinstance(data, dict):
+            self.bot.logger.warning("Dropping malformed message from Kava server: %r", data)
+            return
 
-        if data['type'] == "request":
-            _ = self.bot.loop.create_task(self._handle_request(data))
-        elif data['type'] == "response":
+        message_type = data.get('type')
+
+        if message_type == "request":
+            self._handle_request(data)
+        elif message_type == "response":
             request_id = data.get('id')
 
-            if request_id in self.pending_requests:
-                self.pending_requests[request_id].set_result(data['data'])
-                del self.pending_requests[request_id]
+            future = self.pending_requests.pop(request_id, None)
+
+            if future and not future.done():
+                future.set_result(data.get('data'))
+        elif message_type == "ping":
+            _ = self.bot.loop.create_task(self.send({"type": "pong", "id": data.get('id')}, buffer=False))
+        elif message_type == "pong":
+            future = self._pings.get(data.get('id'))
 
-    async def _handle_request(self, request: Dict[str, Any]) -> None:
+            if future and not future.done():
+                future.set_result(None)
+        else:
+            self.bot.logger.debug("Ignoring message of unknown type %r from Kava server", message_type)
+
+    def _handle_request(self, request: Dict[str, Any]) -> None:
         self.bot.logger.debug(f"Handling request {request}")
 
-        request_id = request['id']
-        endpoint = request['endpoint']
-        data = request['data']
+        request_id = request.get('id')
+        endpoint = request.get('endpoint')
+        data = request.get('data', {})
 
-        request_obj = Request(self, request_id, data)
+        if request_id is None:
+            self.bot.logger.warning("Dropping request without an ID from Kava server: %r", request)
+            return
 
-        if endpoint in self.handlers:
-            for handler in self.handlers[endpoint]:
-                _ = self.bot.loop.create_task(handler(self, request_obj, **data))
-        else:
-            await request_obj.respond({"status": "error", "message": "No handler for endpoint"})
+        timeout = request.get('timeout')
 
-    async def request(self, endpoint: str, **kwargs: Any) -> Any:
-        request_id = str(uuid.uuid4())
-        future = Future()
+        request_obj = Request(
+            self, request_id, data if isinstance(data, dict) else {},
+            timeout if isinstance(timeout, (int, float)) else None, endpoint
+        )
 
-        self.pending_requests[request_id] = future
+        if not isinstance(endpoint, str) or not isinstance(data, dict):
+            self.bot.logger.warning("Rejecting malformed request %s from Kava server", request_id)
+
+            _ = self.bot.loop.create_task(request_obj.respond({"status": "error", "message": "Malformed request"}))
+            return
+
+        if request_obj.expired:
+            self.bot.logger.debug("Dropping request %s as its deadline has already passed", request_id)
+            return
+
+        if endpoint not in self.handlers:
+            _ = self.bot.loop.create_task(
+                request_obj.respond({"status": "error", "message": "No handler for endpoint"})
+            )
+            return
+
+        # Only requests with an explicit key are deduplicated, IDs are reused across sessions.
+        # Read-only requests are cheap to run again, storing their responses would only evict the others.
+        idempotency_key = request.get('idempotency_key')
+
+        if idempotency_key is None or endpoint not in MUTATING_ENDPOINTS:
+            self._submit(endpoint, request_obj)
+            return
+
+        if (response := self.responses.get(idempotency_key)) is not None:
+            self.bot.logger.debug("Replaying stored response to request %s", request_id)
+
+            _ = self.bot.loop.create_task(request_obj.respond(response))
+            return
+
+        if not self.responses.begin(idempotency_key, request_obj):
+            self.bot.logger.debug("Request %s is already being handled, waiting for its response", request_id)
+            return
+
+        request_obj.idempotency_key = idempotency_key
+
+        self._submit(endpoint, request_obj)
+
+    def _submit(self, endpoint: str, request: Request) -> None:
+        """
+        Queue a request on the dispatcher, answering it right away if the bot is too busy.
+        """
+        accepted = self.dispatcher.submit(
+            self.dispatcher.priority_of(endpoint),
+            lambda: self._run_handlers(self.handlers[endpoint], request)
+        )
+
+        if not accepted:
+            self.bot.logger.warning("Rejecting request %s to endpoint %s as the bot is busy", request.id, endpoint)
+
+            _ = self.bot.loop.create_task(request.respond_busy())
+
+    async def _run_handlers(self, handlers: List[Callable[..., Coroutine[Any, Any, None]]], request: Request) -> None:
+        """
+        Run the handlers for a request, abandoning it quietly if the caller gives up.
+        :param handlers: The handlers to run.
+        :param request: The request to handle.
+        :return: None
+        """
+        try:
+            for handler in handlers:
+                if request.expired:
+                    self.bot.logger.debug("Dropping request %s as its deadline has passed", request.id)
+                    return
+
+                try:
+                    with kava_handler_seconds.time(endpoint=request.endpoint):
+                        await handler(self, request, **request.data)
+                except RequestExpired:
+                    self.bot.logger.debug("Abandoned request %s as its deadline has passed", request.id)
+                except Exception:  # skipcq: PYL-W0703
+                    # E.g. a request whose data doesn't match the handler's parameters
+                    self.bot.logger.exception(
+                        "Failed to handle request %s to endpoint %s", request.id, request.endpoint
+                    )
+
+                    if not request.responded:
+                        await request.respond({"status": "error", "message": "Failed to handle the request"})
+
+                    return
+        finally:
+            if request.idempotency_key is not None:  # The handlers never responded
+                self.responses.abandon(request.idempotency_key, request)
+
+    async def send(self, message: Dict[str, Any], buffer: bool = True,
+                   encoded: Optional[Union[str, bytes]] = None) -> None:
+        """
+        Send a message to the Kava server.
+        :param message: The message to send.
+        :param buffer: Whether to hold the message until the connection is back if it's currently down.
+            Messages that are not buffered are dropped instead.
+        :param encoded: The message already encoded with the current codec, sent as is unless it's batched.
+        :return: None
+        :raise RequestBufferFull: If the message should be buffered but the buffer is full.
+        """
+        if self.connected and self.batching:
+            self._outbox.append(message)
+
+            if len(self._outbox) >= self.batch_size:
+                await self._send_outbox()
+            elif not self._outbox_timer:
+                self._outbox_timer = self.bot.loop.create_task(self._send_outbox_later())
+
+            return
+
+        if self.connected:
+            try:
+                await self.websocket.send(encoded if encoded is not None else self.codec.encode(message))
+                return
+            except websockets.ConnectionClosed:
+                pass
+
+        if not buffer:
+            self.bot.logger.debug("Dropping message %s as the connection to Kava server is down", message)
+            return
+
+        if len(self.outbound_buffer) >= self.buffer_size:
+            raise RequestBufferFull("The connection to Kava server is down and the outbound buffer is full.")
+
+        self.outbound_buffer.append(message)
+
+    async def notify(self, endpoint: str, **kwargs: Any) -> None:
+        """
+        Send a one-way event to the Kava server, which doesn't respond to it.
+        Events are dropped while the connection is down.
+        :param endpoint: The endpoint of the event.
+        :param kwargs: The data of the event.
+        :return: None
+        """
+        await self.send(
+            {
+                "type": "event",
+                "endpoint": endpoint,
+                "data": kwargs
+            },
+            buffer=False
+        )
+
+    async def _send_outbox_later(self) -> None:
+        await asyncio.sleep(self.batch_window)
+        await self._send_outbox()
+
+    async def _send_outbox(self) -> None:
+        """
+        Send the queued messages as a single frame.
+        Requests that couldn't be sent go back to the outbound buffer to be sent after reconnecting.
+        """
+        batch, self._outbox = self._outbox, []
+
+        if self._outbox_timer and self._outbox_timer is not asyncio.current_task():
+            self._outbox_timer.cancel()
+
+        self._outbox_timer = None
+
+        if not batch:
+            return
+
+        try:
+            if self.websocket is None:
+                raise websockets.ConnectionClosed(None, None)
+
+            await self.websocket.send(self.codec.encode(batch if len(batch) > 1 else batch[0]))
+        except websockets.ConnectionClosed:
+            for message in batch:
+                if message['type'] == "request" and message['id'] in self.pending_requests:
+                    self.outbound_buffer.append(message)
+
+    async def request(self, endpoint: str, *, timeout: Optional[float] = None, **kwargs: Any) -> Any:
+        """
+        Make a request to the Kava server and wait for its response.
+        :param endpoint: The endpoint to request.
+        :param timeout: How many seconds to wait for the response,
+            defaults to the timeout configured for the endpoint.
+        :param kwargs: The data of the request.
+        :return: The response data.
+        :raise RequestTimedOut: If no response arrived in time.
+        :raise ConnectionLost: If the connection dropped after the request was sent.
+        :raise RequestBufferFull: If the connection is down and the outbound buffer is full.
+        """
+        if timeout is None:
+            timeout = self.endpoint_timeouts.get(endpoint, self.default_timeout)
+
+        request_id = self._next_request_id()
+        future = Future()
 
         message = {
             "type": "request",
             "id": request_id,
             "endpoint": endpoint,
+            "timeout": timeout,
             "data": kwargs
         }
 
-        await self.websocket.send(json.dumps(message))
+        self.pending_requests[request_id] = future
+
+        start = perf_counter()
+        outcome = "error"
+
+        try:
+            await self.send(message)
+
+            response = await asyncio.wait_for(future, timeout)
+            outcome = "success"
+
+            return response
+        except asyncio.TimeoutError as error:
+            outcome = "timeout"
+
+            try:
+                self.outbound_buffer.remove(message)
+            except ValueError:
+                pass
+
+            raise RequestTimedOut(f"Request {request_id} to endpoint {endpoint} timed out") from error
+        finally:
+            self.pending_requests.pop(request_id, None)
 
-        return await future
+            kava_request_seconds.observe(perf_counter() - start, endpoint=endpoint, outcome=outcome)
 
     def add_handler(self, endpoint: str,
                     handler: Callable[..., Coroutine[Any, Any, None]]) -> None:
@@ -105,15 +776,35 @@ class KavaClient:
         self.handlers[endpoint].append(handler)
 
     async def connect(self) -> None:
+        """
+        Start connecting to the Kava server. The connection is re-established automatically whenever it drops,
+        until close() is called.
+        :return: None
+        """
         self.bot.logger.info("Connecting to Kava server...")
 
-        if not self.websocket or self.websocket.closed:
-            self.websocket = await websockets.connect(self.uri)
-            _ = self.bot.loop.create_task(self._handle_connection())
+        self._closing = False
+
+        if not self._supervisor or self._supervisor.done():
+            self._supervisor = self.bot.loop.create_task(self._supervise())
 
     async def close(self) -> None:
         self.bot.logger.info("Closing Kava client...")
 
+        self._closing = True
+        self._ready = False
+
+        self.outbound_buffer.clear()
+
+        for future in self.pending_requests.values():
+            future.cancel()
+
+        self.pending_requests.clear()
+
+        if self._supervisor:
+            self._supervisor.cancel()
+            self._supervisor = None
+
         if self.websocket:
             await self.websocket.close()
             self.websocket = None
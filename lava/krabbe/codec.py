@@ -0,0 +1,151 @@
+import json
+import zlib
+from typing import Any, Union, Optional, Dict, List
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+RAW_FRAME = b"\x00"
+COMPRESSED_FRAME = b"\x01"
+
+
+class Codec:
+    """
+    Encodes messages into websocket frames and decodes them back.
+    """
+    name: str = ""
+    binary: bool = False
+
+    def encode(self, data: Any) -> Union[str, bytes]:
+        """
+        Encode a message into a frame.
+        :param data: The message to encode.
+        :return: The encoded frame.
+        """
+        raise NotImplementedError
+
+    def decode(self, message: Union[str, bytes]) -> Any:
+        """
+        Decode a frame into a message.
+        :param message: The frame to decode.
+        :return: The decoded message.
+        """
+        raise NotImplementedError
+
+
+class JsonCodec(Codec):
+    """
+    The stdlib JSON codec, used as the fallback for servers that don't negotiate a codec.
+    """
+    name = "json"
+
+    def encode(self, data: Any) -> str:
+        return json.dumps(data)
+
+    def decode(self, message: Union[str, bytes]) -> Any:
+        return json.loads(message)
+
+
+class OrjsonCodec(Codec):
+    """
+    JSON encoded with orjson, sent as binary frames to skip the str round trip.
+    """
+    name = "orjson"
+    binary = True
+
+    def encode(self, data: Any) -> bytes:
+        return orjson.dumps(data)
+
+    def decode(self, message: Union[str, bytes]) -> Any:
+        return orjson.loads(message)
+
+
+class MsgpackCodec(Codec):
+    """
+    Compact binary framing with msgpack.
+    """
+    name = "msgpack"
+    binary = True
+
+    def encode(self, data: Any) -> bytes:
+        return msgpack.packb(data, use_bin_type=True)
+
+    def decode(self, message: Union[str, bytes]) -> Any:
+        return msgpack.unpackb(message, raw=False, strict_map_key=False)
+
+
+class CompressedCodec(Codec):
+    """
+    Wraps a binary codec, compressing frames larger than a threshold with zlib.
+
+    Every frame is prefixed with a byte telling whether the rest of it is compressed.
+    """
+    binary = True
+
+    def __init__(self, codec: Codec, threshold: int):
+        """
+        :param codec: The binary codec to wrap.
+        :param threshold: Frames larger than this amount of bytes are compressed.
+        """
+        self.codec = codec
+        self.threshold = threshold
+        self.name = codec.name
+
+    def encode(self, data: Any) -> bytes:
+        encoded = self.codec.encode(data)
+
+        if len(encoded) > self.threshold:
+            return COMPRESSED_FRAME + zlib.compress(encoded)
+
+        return RAW_FRAME + encoded
+
+    def decode(self, message: Union[str, bytes]) -> Any:
+        if message[:1] == COMPRESSED_FRAME:
+            return self.codec.decode(zlib.decompress(message[1:]))
+
+        return self.codec.decode(message[1:])
+
+
+def available_codecs() -> Dict[str, Codec]:
+    """
+    Get the codecs usable in this environment, ordered by preference.
+    :return: A dict mapping codec names to codecs.
+    """
+    codecs: List[Codec] = []
+
+    if msgpack is not None:
+        codecs.append(MsgpackCodec())
+
+    if orjson is not None:
+        codecs.append(OrjsonCodec())
+
+    codecs.append(JsonCodec())
+
+    return {codec.name: codec for codec in codecs}
+
+
+def get_codec(name: str, compression_threshold: Optional[int] = None) -> Codec:
+    """
+    Get a codec by its negotiated name.
+    :param name: The name of the codec.
+    :param compression_threshold: Compress frames larger than this amount of bytes, None to disable compression.
+        Only binary codecs support compression.
+    :return: The codec.
+    :raise ValueError: If the codec is not available.
+    """
+    codec = available_codecs().get(name)
+
+    if codec is None:
+        raise ValueError(f"Codec {name} is not available")
+
+    if compression_threshold and codec.binary:
+        return CompressedCodec(codec, compression_threshold)
+
+    return codec
@@ -0,0 +1,126 @@
+import asyncio
+from asyncio import Queue, QueueFull, Task
+from enum import IntEnum
+from logging import getLogger
+from typing import Callable, Coroutine, Any, Dict, List, Optional
+
+
+class Priority(IntEnum):
+    CONTROL = 0
+    RESOLUTION = 1
+    INFORMATIONAL = 2
+
+
+ENDPOINT_PRIORITIES: Dict[str, Priority] = {
+    "connect": Priority.CONTROL,
+    "volume": Priority.CONTROL,
+    "skip": Priority.CONTROL,
+    "remove": Priority.CONTROL,
+    "clean": Priority.CONTROL,
+    "pause": Priority.CONTROL,
+    "resume": Priority.CONTROL,
+    "stop": Priority.CONTROL,
+    "invalidate_permissions": Priority.CONTROL,
+    "play": Priority.RESOLUTION,
+    "search": Priority.RESOLUTION,
+    "get_client_info": Priority.INFORMATIONAL,
+    "nowplaying": Priority.INFORMATIONAL,
+    "song_info_embed": Priority.INFORMATIONAL,
+    "queue": Priority.INFORMATIONAL,
+    "ingestion_progress": Priority.INFORMATIONAL,
+    "get_load": Priority.CONTROL
+}
+
+DEFAULT_CONCURRENCY: Dict[Priority, int] = {
+    Priority.CONTROL: 16,
+    Priority.RESOLUTION: 8,
+    Priority.INFORMATIONAL: 4
+}
+
+DEFAULT_MAX_QUEUED: Dict[Priority, int] = {
+    Priority.CONTROL: 256,
+    Priority.RESOLUTION: 64,
+    Priority.INFORMATIONAL: 64
+}
+
+
+class PriorityDispatcher:
+    """
+    Runs jobs on a bounded pool of workers per priority class, so a flood of slow jobs in one class
+    can't delay the jobs of another, and rejects jobs right away once a class is backed up.
+    """
+
+    def __init__(self,
+                 concurrency: Optional[Dict[Priority, int]] = None,
+                 max_queued: Optional[Dict[Priority, int]] = None):
+        """
+        :param concurrency: The amount of workers for each priority class.
+        :param max_queued: The max amount of jobs waiting for a worker in each priority class.
+        """
+        self.concurrency: Dict[Priority, int] = {**DEFAULT_CONCURRENCY, **(concurrency or {})}
+        self.max_queued: Dict[Priority, int] = {**DEFAULT_MAX_QUEUED, **(max_queued or {})}
+
+        self.queues: Dict[Priority, Queue] = {}
+        self.workers: List[Task] = []
+
+        self.logger = getLogger("lava.krabbe.dispatcher")
+
+    @staticmethod
+    def priority_of(endpoint: str) -> Priority:
+        """
+        Get the priority class of an endpoint. Unknown endpoints are treated as informational.
+        :param endpoint: The endpoint.
+        :return: The priority class.
+        """
+        return ENDPOINT_PRIORITIES.get(endpoint, Priority.INFORMATIONAL)
+
+    def _start(self) -> None:
+        for priority in Priority:
+            self.queues[priority] = Queue(maxsize=self.max_queued[priority])
+
+            for _ in range(self.concurrency[priority]):
+                self.workers.append(asyncio.get_running_loop().create_task(self._work(self.queues[priority])))
+
+    async def _work(self, queue: Queue) -> None:
+        while True:
+            job = await queue.get()
+
+            try:
+                await job()
+            except Exception:  # skipcq: PYL-W0703
+                self.logger.exception("Unhandled exception while running a job")
+            finally:
+                queue.task_done()
+
+    def submit(self, priority: Priority, job: Callable[[], Coroutine[Any, Any, None]]) -> bool:
+        """
+        Queue a job to run on the workers of a priority class.
+        :param priority: The priority class of the job.
+        :param job: A function returning the coroutine to run.
+        :return: Whether the job was accepted, False if the priority class is too busy.
+        """
+        if not self.workers:
+            self._start()
+
+        try:
+            self.queues[priority].put_nowait(job)
+        except QueueFull:
+            return False
+
+        return True
+
+    def queued(self, priority: Priority) -> int:
+        """
+        Get the amount of jobs waiting for a worker in a priority class.
+        """
+        return self.queues[priority].qsize() if priority in self.queues else 0
+
+    def stop(self) -> None:
+        """
+        Stop all the workers, dropping the queued jobs.
+        """
+        for worker in self.workers:
+            worker.cancel()
+
+        self.workers.clear()
+        self.queues.clear()
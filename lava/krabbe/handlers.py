@@ -1,16 +1,24 @@
 import re
 from typing import TYPE_CHECKING, Optional
 
+from disnake import VoiceChannel
 from lavalink import LoadResult, LoadType
 
 from lava.classes.player import LavaPlayer
+from lava.classes.playlist_ingestion import PartialLoadResult, PlaylistIngestion
 from lava.classes.voice_client import LavalinkVoiceClient
 from lava.embeds import InfoEmbed
-from lava.krabbe.utils import ensure_channel
+from lava.krabbe.load import build_load_report
+from lava.krabbe.utils import ensure_channel, serialized
 
 if TYPE_CHECKING:
     from lava.krabbe.client import KavaClient, Request
 
+URL_RX = re.compile(r"http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*(),]|%[0-9a-fA-F][0-9a-fA-F])+")
+
+QUEUE_PAGE_SIZE = 25
+MAX_QUEUE_PAGE_SIZE = 100
+
 
 async def get_client_info(client: "KavaClient", request: "Request"):
     await request.respond(
@@ -114,12 +122,15 @@ async def play(client: "KavaClient", request: "Request", channel_id: int, author
 
     player: LavaPlayer = client.bot.lavalink.player_manager.get(channel.guild.id)
 
-    results: LoadResult = await player.node.get_tracks(query)
+    # Lavalink and the local sources are raced, the first one finding something wins. The race isn't capped, a slow
+    # yt-dlp extraction is bounded by its own timeout, and the whole race by the deadline of the request.
+    resolution = await request.within_deadline(
+        client.bot.lavalink.resolver.resolve(
+            query, backends=(None,), include_local=True, node=player.node, timeout=None
+        )
+    )
 
-    # Check locals
-    if not results or not results.tracks:
-        client.bot.logger.info("No results found with lavalink for query %s, checking local sources", query)
-        results: LoadResult = await client.bot.lavalink.get_local_tracks(query)
+    results: Optional[LoadResult] = resolution[0] if resolution else None
 
     if not results or not results.tracks:  # If nothing was found
         await request.respond(
@@ -130,6 +141,28 @@ async def play(client: "KavaClient", request: "Request", channel_id: int, author
         )
         return
 
+    await client.bot.guild_executor.run(
+        channel.guild.id, lambda: enqueue(request, channel, player, results, author_id, index, volume, shuffle)
+    )
+
+    if isinstance(results, PartialLoadResult):
+        ingestion = results.ingestion
+        ingestion.tracks = set(results.tracks)
+
+        player.add_ingestion(ingestion)
+
+        ingestion.start(
+            lambda tracks: client.bot.guild_executor.run(
+                channel.guild.id, lambda: enqueue_ingested(player, ingestion, tracks, author_id)
+            )
+        )
+
+
+async def enqueue(request: "Request", channel: VoiceChannel, player: LavaPlayer, results: LoadResult,
+                  author_id: int, index: Optional[int], volume: int, shuffle: bool):
+    """
+    Add the resolved tracks of a play request to the queue, this should run through the guild executor.
+    """
     # Find the index song should be (In front of any autoplay songs)
     if not index:
         index = sum(1 for t in player.queue if t.requester)
@@ -163,6 +196,9 @@ async def play(client: "KavaClient", request: "Request", channel_id: int, author
                 {
                     "status": "success",
                     "message": f"成功加入待播清單：{len(results.tracks)} / {results.playlist_info.name}"
+                    if not isinstance(results, PartialLoadResult) else
+                    f"成功加入待播清單：{results.playlist_info.name}，"
+                    f"已載入 {len(results.tracks)} / {results.ingestion.total} 首，其餘歌曲將在背景載入"
                 }
             )
 
@@ -177,6 +213,28 @@ async def play(client: "KavaClient", request: "Request", channel_id: int, author
     await player.update_display(new_message=await channel.send(content="Loading..."))
 
 
+async def enqueue_ingested(player: LavaPlayer, ingestion: PlaylistIngestion, tracks: list, author_id: int):
+    """
+    Add a page of tracks loaded in the background right after the tracks of the same playlist already in the queue,
+    this should run through the guild executor.
+    """
+    if ingestion.cancelled:
+        return
+
+    positions = [i for i, track in enumerate(player.queue) if track in ingestion.tracks]
+    remaining = {player.queue[i] for i in positions}
+
+    # If every track of the playlist already left the queue, the playlist has caught up and this page goes last
+    index = positions[-1] + 1 if positions else len(player.queue)
+
+    for iter_index, track in enumerate(tracks):
+        player.add(requester=author_id, track=track, index=index + iter_index)
+
+    # Only the tracks still in the queue are kept, so the played ones can be freed
+    ingestion.tracks = remaining | set(tracks)
+
+
+@serialized
 async def volume(client: "KavaClient", request: "Request", channel_id: int, vol: int):
     if not (channel := await ensure_channel(request, channel_id)):
         return
@@ -202,43 +260,35 @@ async def volume(client: "KavaClient", request: "Request", channel_id: int, vol:
     )
 
 
-async def search(client: "KavaClient", request: "Request", query: str):
-    if re.match(r"http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*(),]|%[0-9a-fA-F][0-9a-fA-F])+", query):
-        await request.respond(
-            {
-                "status": "success",
-                "results": []
-            }
-        )
-
-    if not query:
+async def search(client: "KavaClient", request: "Request", query: str,
+                 user_id: Optional[int] = None, session_id: Optional[str] = None):
+    """
+    Respond with search suggestions for autocomplete. A newer query from the same session or user supersedes this one,
+    in which case empty results are returned right away.
+    """
+    if not query.strip() or URL_RX.match(query):
         await request.respond(
             {
                 "status": "success",
                 "results": []
             }
         )
+        return
 
-    choices = []
-
-    result = await client.bot.lavalink.get_tracks(f"ytsearch:{query}")
-
-    for track in result.tracks:
-        choices.append(
-            {
-                "name": f"{track.title[:80]} by {track.author[:16]}",
-                "value": track.uri
-            }
-        )
+    choices = await request.within_deadline(
+        client.bot.autocomplete.search(query, session=session_id if session_id is not None else user_id)
+    )
 
     await request.respond(
         {
             "status": "success",
-            "results": choices
+            "results": choices or [],
+            "superseded": choices is None
         }
     )
 
 
+@serialized
 async def skip(client: "KavaClient", request: "Request", channel_id: int, target: int, move: bool):
     if not (channel := await ensure_channel(request, channel_id)):
         return
@@ -282,6 +332,7 @@ async def skip(client: "KavaClient", request: "Request", channel_id: int, target
     await player.update_display(new_message=await channel.send("Loading..."))
 
 
+@serialized
 async def remove(client: "KavaClient", request: "Request", channel_id: int, target: int):
     if not (channel := await ensure_channel(request, channel_id)):
         return
@@ -318,6 +369,7 @@ async def remove(client: "KavaClient", request: "Request", channel_id: int, targ
     await player.update_display(new_message=await channel.send("Loading..."))
 
 
+@serialized
 async def clean(client: "KavaClient", request: "Request", channel_id: int):
     if not (channel := await ensure_channel(request, channel_id)):
         return
@@ -333,6 +385,7 @@ async def clean(client: "KavaClient", request: "Request", channel_id: int):
         )
         return
 
+    player.cancel_ingestions()
     player.queue.clear()
 
     await request.respond(
@@ -345,6 +398,7 @@ async def clean(client: "KavaClient", request: "Request", channel_id: int):
     await player.update_display(new_message=await channel.send("Loading..."))
 
 
+@serialized
 async def pause(client: "KavaClient", request: "Request", channel_id: int):
     if not (channel := await ensure_channel(request, channel_id)):
         return
@@ -372,6 +426,7 @@ async def pause(client: "KavaClient", request: "Request", channel_id: int):
     await player.update_display(new_message=await channel.send("Loading..."))
 
 
+@serialized
 async def resume(client: "KavaClient", request: "Request", channel_id: int):
     if not (channel := await ensure_channel(request, channel_id)):
         return
@@ -399,6 +454,7 @@ async def resume(client: "KavaClient", request: "Request", channel_id: int):
     await player.update_display(new_message=await channel.send("Loading..."))
 
 
+@serialized
 async def stop(client: "KavaClient", request: "Request", channel_id: int):
     if not (channel := await ensure_channel(request, channel_id)):
         return
@@ -429,16 +485,138 @@ async def stop(client: "KavaClient", request: "Request", channel_id: int):
     )
 
 
-async def queue(client: "KavaClient", request: "Request", channel_id: int):
+async def queue(client: "KavaClient", request: "Request", channel_id: int,
+                offset: int = 0, limit: Optional[int] = None, cursor: Optional[str] = None,
+                version: Optional[str] = None):
+    """
+    Respond with the queue of a player.
+
+    Without a limit or cursor, the titles of the whole queue are returned like before. With them, a page of compact
+    tracks is returned along with a cursor for the next page. Every response carries the total track count and the
+    version of the queue, callers that pass the version they last saw get an "unchanged" response if it still matches.
+    The version is opaque, it includes an epoch so the queue of a recreated player never matches an old version.
+    """
     if not (channel := await ensure_channel(request, channel_id)):
         return
 
     player: LavaPlayer = client.bot.lavalink.player_manager.get(channel.guild.id)
 
+    tracks = player.queue
+    current_version = tracks.stamp
+
+    if cursor is not None:
+        try:
+            cursor_version, offset = str(cursor).rsplit(":", 1)
+            offset = int(offset)
+        except ValueError:
+            await request.respond(
+                {
+                    "status": "error",
+                    "message": "Invalid cursor"
+                }
+            )
+            return
+
+        if cursor_version != current_version:
+            await request.respond(
+                {
+                    "status": "error",
+                    "stale": True,
+                    "version": current_version,
+                    "total": len(tracks),
+                    "message": "待播清單已變更，請重新載入。"
+                }
+            )
+            return
+
+        limit = limit or QUEUE_PAGE_SIZE
+
+    elif version is not None and str(version) == current_version:
+        await request.respond(
+            {
+                "status": "success",
+                "unchanged": True,
+                "version": current_version,
+                "total": len(tracks)
+            }
+        )
+        return
+
+    if limit is None:
+        await request.respond(
+            {
+                "status": "success",
+                "version": current_version,
+                "total": len(tracks),
+                "queue": [track.title for track in tracks]
+            }
+        )
+        return
+
+    offset = max(0, offset)
+    limit = max(1, min(limit, MAX_QUEUE_PAGE_SIZE))
+    end = offset + limit
+
+    await request.respond(
+        {
+            "status": "success",
+            "version": current_version,
+            "total": len(tracks),
+            "offset": offset,
+            "tracks": [
+                {
+                    "title": track.title,
+                    "author": track.author,
+                    "duration": track.duration,
+                    "requester": track.requester
+                }
+                for track in tracks[offset:end]
+            ],
+            "next_cursor": f"{current_version}:{end}" if end < len(tracks) else None
+        }
+    )
+
+
+async def ingestion_progress(client: "KavaClient", request: "Request", channel_id: int):
+    """
+    Respond with the progress of the playlists still loading into the queue of a player, e.g. "loaded 1200/3400".
+    """
+    if not (channel := await ensure_channel(request, channel_id)):
+        return
+
+    player: LavaPlayer = client.bot.lavalink.player_manager.get(channel.guild.id)
+
+    await request.respond(
+        {
+            "status": "success",
+            "ingestions": [ingestion.to_dict() for ingestion in player.ingestions] if player else []
+        }
+    )
+
+
+async def get_load(client: "KavaClient", request: "Request"):
+    await request.respond(
+        {
+            "status": "success",
+            **build_load_report(client.bot)
+        }
+    )
+
+
+async def invalidate_permissions(client: "KavaClient", request: "Request",
+                                 channel_id: Optional[int] = None, user_id: Optional[int] = None):
+    """
+    Pushed by Krabbe when the music permissions of a channel change, drops the cached can_use_music decisions
+    matching the given channel and / or user, or every decision if neither is given.
+    """
+    removed = client.permission_cache.invalidate(
+        lambda key: (user_id is None or key[0] == user_id) and (channel_id is None or key[1] == channel_id)
+    )
+
     await request.respond(
         {
             "status": "success",
-            "queue": [track.title for track in player.queue]
+            "invalidated": removed
         }
     )
 
@@ -461,3 +639,6 @@ def add_handlers(client: "KavaClient"):
     client.add_handler("resume", resume)
     client.add_handler("stop", stop)
     client.add_handler("queue", queue)
+    client.add_handler("invalidate_permissions", invalidate_permissions)
+    client.add_handler("get_load", get_load)
+    client.add_handler("ingestion_progress", ingestion_progress)
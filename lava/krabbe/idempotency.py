@@ -0,0 +1,87 @@
+from typing import TYPE_CHECKING, Dict, Any, List, Hashable, Optional, Tuple
+
+from lava.cache import TTLCache
+
+if TYPE_CHECKING:
+    from lava.krabbe.client import Request
+
+# The endpoints whose requests change the player, only these are worth replaying instead of running again
+MUTATING_ENDPOINTS = frozenset({
+    "connect", "play", "volume", "skip", "remove", "clean", "pause", "resume", "stop"
+})
+
+
+class ResponseStore:
+    """
+    Remembers the responses to recent requests by their idempotency key, so a request retried after a reconnect
+    replays the stored response instead of running its handler, and mutating the player, a second time.
+    """
+
+    def __init__(self, maxsize: int = 2048, ttl: float = 300.0, max_bytes: int = 4 * 1024 * 1024):
+        """
+        :param maxsize: The max amount of stored responses.
+        :param ttl: How many seconds a response is stored for.
+        :param max_bytes: The max total size of the stored responses, as encoded on the wire.
+        """
+        self.responses: TTLCache[Hashable, Dict[str, Any]] = TTLCache(maxsize, ttl, max_weight=max_bytes)
+        # Key -> the request being handled and the duplicates waiting for its response
+        self.in_flight: Dict[Hashable, Tuple["Request", List["Request"]]] = {}
+
+    def get(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        """
+        Get the stored response for a key.
+        :param key: The idempotency key.
+        :return: The stored response data, None if there is none.
+        """
+        return self.responses.get(key)
+
+    def begin(self, key: Hashable, request: "Request") -> bool:
+        """
+        Mark a request as being handled.
+        :param key: The idempotency key of the request.
+        :param request: The request.
+        :return: True if the request should be handled, False if a request with the same key is already being handled,
+            in which case this request is answered with its response once it completes.
+        """
+        if key in self.in_flight:
+            self.in_flight[key][1].append(request)
+            return False
+
+        self.in_flight[key] = (request, [])
+        return True
+
+    def complete(self, key: Hashable, request: "Request", response_data: Dict[str, Any],
+                 weight: int) -> List["Request"]:
+        """
+        Store the response of a handled request.
+        :param key: The idempotency key of the request.
+        :param request: The request that was handled.
+        :param response_data: The response data.
+        :param weight: The size of the encoded response in bytes.
+        :return: The duplicate requests that were waiting for this response.
+        """
+        if key not in self.in_flight or self.in_flight[key][0] is not request:  # Begun before the store was cleared
+            return []
+
+        _, waiting = self.in_flight.pop(key)
+
+        self.responses.set(key, response_data, weight=weight)
+
+        return waiting
+
+    def abandon(self, key: Hashable, request: "Request") -> None:
+        """
+        Forget a request that finished without responding, so a retry runs its handler again.
+        :param key: The idempotency key of the request.
+        :param request: The request.
+        """
+        if key in self.in_flight and self.in_flight[key][0] is request:
+            del self.in_flight[key]
+
+    def clear(self) -> None:
+        """
+        Forget every stored response and request being handled, e.g. when the server starts a new session.
+        Requests of the old session still being handled respond normally, but their responses aren't stored.
+        """
+        self.responses.clear()
+        self.in_flight.clear()
@@ -0,0 +1,77 @@
+import asyncio
+from typing import TYPE_CHECKING, Dict, Any, Optional
+
+from lava.krabbe.dispatcher import Priority
+from lava.metrics import loop_lag_monitor
+
+if TYPE_CHECKING:
+    from lava.bot import Bot
+
+
+def build_load_report(bot: "Bot") -> Dict[str, Any]:
+    """
+    Build a compact report of how loaded this bot is, for Krabbe to place new players on the least loaded bot.
+    :param bot: The bot to report on.
+    :return: The load report.
+    """
+    players = list(bot.lavalink.player_manager.players.values())
+
+    return {
+        "bot_user_id": bot.user.id,
+        "players": len(players),
+        "playing_players": sum(1 for player in players if player.is_playing),
+        "nodes": [
+            {
+                "name": node.name,
+                "available": node.available,
+                "players": node.stats.players,
+                "playing_players": node.stats.playing_players,
+                "system_load": node.stats.system_load,
+                "lavalink_load": node.stats.lavalink_load,
+                "frames_deficit": node.stats.frames_deficit,
+                "penalty": node.stats.penalty.total
+            }
+            for node in bot.lavalink.node_manager.nodes
+        ],
+        "loop_lag_ms": round(loop_lag_monitor.lag * 1000, 1),
+        "pending_requests": len(bot.kava_client.pending_requests),
+        "queued_requests": sum(bot.kava_client.dispatcher.queued(priority) for priority in Priority)
+    }
+
+
+class LoadReporter:
+    """
+    Periodically pushes the load report of the bot to Krabbe.
+    """
+
+    def __init__(self, bot: "Bot", interval: float = 15.0):
+        """
+        :param bot: The bot to report on.
+        :param interval: How many seconds to wait between reports.
+        """
+        self.bot = bot
+        self.interval = interval
+
+        self._task: Optional[asyncio.Task] = None
+
+    async def _report(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+
+            if not self.bot.kava_client.connected:
+                continue
+
+            try:
+                await self.bot.kava_client.notify("report_load", **build_load_report(self.bot))
+            except Exception:  # skipcq: PYL-W0703
+                # A failed report mustn't stop the next ones
+                self.bot.logger.exception("Failed to report the load to Kava server")
+
+    def start(self) -> None:
+        if not self._task or self._task.done():
+            self._task = self.bot.loop.create_task(self._report())
+
+    def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
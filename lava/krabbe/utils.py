@@ -1,10 +1,15 @@
-from typing import TYPE_CHECKING, Optional
+from functools import wraps
+from typing import TYPE_CHECKING, Optional, Callable, Coroutine, Any
 
 from disnake import VoiceChannel
 
 if TYPE_CHECKING:
     from lava.krabbe.client import Request, KavaClient
 
+# The max amount of serialized requests of a guild running or waiting at once. Each of them holds a dispatcher worker,
+# so a guild flooding its player can't take all the workers from the other guilds.
+MAX_PENDING_PER_GUILD = 4
+
 
 async def ensure_channel(request: "Request", channel_id: int) -> Optional[VoiceChannel]:
     """
@@ -28,6 +33,32 @@ async def ensure_channel(request: "Request", channel_id: int) -> Optional[VoiceC
     return channel
 
 
+def serialized(handler: Callable[..., Coroutine[Any, Any, None]]) -> Callable[..., Coroutine[Any, Any, None]]:
+    """
+    Decorate a handler taking a channel_id so it runs through the guild executor of the channel's guild,
+    after any earlier operation on the same player. Requests beyond MAX_PENDING_PER_GUILD are answered as busy.
+    :param handler: The handler to decorate.
+    :return: The decorated handler.
+    """
+    @wraps(handler)
+    async def wrapper(client: "KavaClient", request: "Request", channel_id: int, **kwargs: Any) -> None:
+        channel = client.bot.get_channel(channel_id)
+
+        if channel is None or not isinstance(channel, VoiceChannel):  # Let the handler respond with the error
+            return await handler(client, request, channel_id=channel_id, **kwargs)
+
+        if client.bot.guild_executor.pending(channel.guild.id) >= MAX_PENDING_PER_GUILD:
+            client.bot.logger.warning("Rejecting request %s as guild %s is busy", request.id, channel.guild.id)
+
+            return await request.respond_busy()
+
+        return await client.bot.guild_executor.run(
+            channel.guild.id, lambda: handler(client, request, channel_id=channel_id, **kwargs)
+        )
+
+    return wrapper
+
+
 async def can_use_music(client: "KavaClient", user_id: int, channel_id: int) -> bool:
     """
     Check if the user can use music commands in the channel.
@@ -36,11 +67,20 @@ async def can_use_music(client: "KavaClient", user_id: int, channel_id: int) ->
     :param channel_id: The channel ID to check.
     :return: True if the user can use music commands. False otherwise.
     """
+    if (allowed := client.permission_cache.get((user_id, channel_id))) is not None:
+        return allowed
+
     response = await client.request("can_use_music", user_id=user_id, channel_id=channel_id)
 
     if response["status"] == "error":
-        return False
+        allowed = False
     elif response["status"] == "success":
-        return True
+        allowed = True
     else:
         raise ValueError("Invalid response status.")
+
+    # A busy server didn't decide anything, so the rejection isn't remembered
+    if not response.get("busy"):
+        client.permission_cache.set((user_id, channel_id), allowed)
+
+    return allowed
@@ -0,0 +1,106 @@
+import asyncio
+import re
+from logging import getLogger
+from typing import Optional, Mapping
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from lava.cache import TTLCache, MISSING
+from lava.http import LazySession
+from lava.metrics import media_probes
+
+MEDIA_EXTENSIONS = (
+    ".mp3", ".ogg", ".oga", ".opus", ".flac", ".wav", ".m4a", ".aac", ".weba", ".webm", ".mka", ".mp4", ".m3u8",
+    ".pls"
+)
+
+MEDIA_CONTENT_TYPES = (
+    "audio/", "video/", "application/ogg", "application/vnd.apple.mpegurl", "application/x-mpegurl"
+)
+
+STREAM_SERVER_RX = re.compile(r'icecast|shoutcast', re.IGNORECASE)
+
+
+class MediaProbe:
+    """
+    Tells direct media urls, e.g. audio files and Icecast streams, from web pages, so direct media can go straight to
+    Lavalink's HTTP source instead of through yt-dlp. The extension of the url is checked first, then the headers of
+    a ranged GET. What a host serves is cached, as a host serving media or pages usually serves only that.
+    """
+
+    def __init__(self, timeout: float = 5.0, maxsize: int = 1024, ttl: float = 60 * 60):
+        """
+        :param timeout: How many seconds a probe may take, a url timing out is treated as a web page.
+        :param maxsize: The max amount of cached hosts.
+        :param ttl: How many seconds what a host serves is cached for.
+        """
+        self.timeout = timeout
+
+        # Host -> whether it serves direct media
+        self.hosts: TTLCache[str, bool] = TTLCache(maxsize, ttl)
+
+        self.http = LazySession(timeout=aiohttp.ClientTimeout(total=timeout))
+
+        self.logger = getLogger("lava.media_probe")
+
+    @staticmethod
+    def is_media_response(headers: Mapping[str, str]) -> bool:
+        """
+        Check if the headers of a response are those of direct media.
+        :param headers: The headers of the response.
+        :return: Whether the response is direct media.
+        """
+        if any(name.lower().startswith("icy-") for name in headers):
+            return True
+
+        if STREAM_SERVER_RX.search(headers.get("Server", "")):
+            return True
+
+        return headers.get("Content-Type", "").lower().startswith(MEDIA_CONTENT_TYPES)
+
+    async def _probe(self, url: str) -> Optional[bool]:
+        try:
+            # Only the headers are read, which works for endless streams too, where a HEAD often isn't supported
+            async with self.http.session.get(url, headers={"Range": "bytes=0-0", "Icy-MetaData": "1"}) as response:
+                if response.status >= 400:
+                    return None
+
+                return self.is_media_response(response.headers)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+            self.logger.debug("Failed to probe %s", url, exc_info=True)
+            return None
+
+    async def is_direct_media(self, url: str) -> bool:
+        """
+        Check if an url points to direct media rather than a web page.
+        :param url: The url.
+        :return: Whether the url is direct media, False if it couldn't be told.
+        """
+        try:
+            parts = urlsplit(url)
+        except ValueError:
+            return False
+
+        if parts.path.lower().endswith(MEDIA_EXTENSIONS):
+            media_probes.inc(result="extension")
+            return True
+
+        host = parts.hostname or ""
+
+        if (cached := self.hosts.get(host, MISSING)) is not MISSING:
+            media_probes.inc(result="cached")
+            return cached
+
+        if (direct := await self._probe(url)) is None:
+            media_probes.inc(result="failed")
+            return False
+
+        self.hosts.set(host, direct)
+
+        media_probes.inc(result="direct" if direct else "page")
+
+        return direct
+
+    async def close(self) -> None:
+        await self.http.close()
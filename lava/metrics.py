@@ -0,0 +1,384 @@
+import asyncio
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from functools import lru_cache
+from logging import getLogger
+from time import perf_counter, monotonic
+from typing import Dict, Tuple, Optional, Callable, List, Iterator, Sequence, Deque
+
+from aiohttp import web
+from psutil import cpu_percent, virtual_memory
+
+from lava.utils import get_commit_hash, get_current_branch, get_upstream_url
+
+LabelValues = Tuple[str, ...]
+
+DEFAULT_BUCKETS: Tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+
+    if extra:
+        pairs.append(extra)
+
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    kind: str = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        """
+        :param name: The name of the metric.
+        :param documentation: The help text of the metric.
+        :param labelnames: The names of the labels of the metric.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames: Tuple[str, ...] = tuple(labelnames)
+
+    def _label_values(self, labels: Dict[str, object]) -> LabelValues:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> Iterator[str]:
+        """
+        Render the samples of this metric in the Prometheus text format.
+        """
+        raise NotImplementedError
+
+    def render(self) -> str:
+        return "\n".join(
+            [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}", *self.samples()]
+        )
+
+
+class ValueMetric(Metric):
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+
+        self.values: Dict[LabelValues, float] = {}
+        self.function: Optional[Callable[[], Dict[LabelValues, float]]] = None
+
+    def set_function(self, function: Callable[[], Dict[LabelValues, float]]) -> None:
+        """
+        Compute the values of this metric when it's collected instead of storing them,
+        for values that are already tracked elsewhere.
+        :param function: A function returning a dict mapping label values to values.
+        """
+        self.function = function
+
+    def samples(self) -> Iterator[str]:
+        values = self.function() if self.function else self.values
+
+        for key, value in values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+
+
+class Counter(ValueMetric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels: object) -> None:
+        key = self._label_values(labels)
+
+        self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(ValueMetric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: object) -> None:
+        self.values[self._label_values(labels)] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+
+        self.buckets: Tuple[float, ...] = tuple(buckets)
+        self.counts: Dict[LabelValues, List[int]] = {}
+        self.sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels: object) -> None:
+        key = self._label_values(labels)
+
+        if key not in self.counts:
+            self.counts[key] = [0] * (len(self.buckets) + 1)
+            self.sums[key] = 0.0
+
+        self.counts[key][bisect_left(self.buckets, value)] += 1
+        self.sums[key] += value
+
+    @contextmanager
+    def time(self, **labels: object) -> Iterator[None]:
+        """
+        Observe the amount of seconds the body of the with statement takes.
+        """
+        start = perf_counter()
+
+        try:
+            yield
+        finally:
+            self.observe(perf_counter() - start, **labels)
+
+    def samples(self) -> Iterator[str]:
+        for key, counts in self.counts.items():
+            cumulative = 0
+
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                bound_label = f'le="{"+Inf" if bound == float("inf") else bound}"'
+
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, key, bound_label)} {cumulative}"
+
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {self.sums[key]}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics[metric.name] = metric
+
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """
+        Render every metric in the Prometheus text format.
+        """
+        return "\n".join(metric.render() for metric in self.metrics.values()) + "\n"
+
+
+registry = MetricsRegistry()
+
+kava_request_seconds = registry.histogram(
+    "lava_kava_request_seconds", "Latency of requests made to the Kava server", ("endpoint", "outcome")
+)
+kava_handler_seconds = registry.histogram(
+    "lava_kava_handler_seconds", "Time spent handling requests from the Kava server", ("endpoint",)
+)
+kava_pending_requests = registry.gauge(
+    "lava_kava_pending_requests", "Requests made to the Kava server still waiting for a response"
+)
+permission_cache_lookups = registry.counter(
+    "lava_permission_cache_lookups_total", "Lookups of cached can_use_music decisions", ("result",)
+)
+kava_heartbeat_rtt_seconds = registry.histogram(
+    "lava_kava_heartbeat_rtt_seconds", "Round trip time of heartbeats to the Kava server"
+)
+kava_last_frame_age_seconds = registry.gauge(
+    "lava_kava_last_frame_age_seconds", "Seconds since the last frame was received from the Kava server"
+)
+lavalink_load_seconds = registry.histogram(
+    "lava_lavalink_load_seconds", "Latency of track loading on Lavalink nodes", ("node", "load_type")
+)
+load_cache_lookups = registry.counter(
+    "lava_load_cache_lookups_total", "Lookups of the shared Lavalink load result cache", ("result",)
+)
+load_cache_saved_seconds = registry.counter(
+    "lava_load_cache_saved_seconds_total", "Lavalink load latency saved by serving results from the cache"
+)
+load_cache_hit_ratio = registry.gauge(
+    "lava_load_cache_hit_ratio", "Ratio of Lavalink loads served from the cache or a shared in-flight request"
+)
+load_cache_hit_ratio.set_function(
+    lambda: {
+        (): 1 - load_cache_lookups.values.get(("miss",), 0) / total
+    } if (total := sum(load_cache_lookups.values.values())) else {}
+)
+autocomplete_lookups = registry.counter(
+    "lava_autocomplete_lookups_total", "Autocomplete searches by how they were served", ("result",)
+)
+resolver_wins = registry.counter(
+    "lava_resolver_wins_total", "Queries resolved by the racing resolver, by the backend whose result was taken",
+    ("backend",)
+)
+audio_cache_plays = registry.counter(
+    "lava_audio_cache_plays_total", "Plays by whether the on-disk audio cache served them", ("result",)
+)
+audio_cache_bytes = registry.gauge(
+    "lava_audio_cache_bytes", "Size of the audio stored in the on-disk audio cache"
+)
+media_probes = registry.counter(
+    "lava_media_probes_total", "Urls probed for direct media before yt-dlp, by how they were told apart", ("result",)
+)
+lavalink_active_players = registry.gauge(
+    "lava_lavalink_active_players", "Players connected on each Lavalink node", ("node",)
+)
+display_edits = registry.counter(
+    "lava_display_edits_total", "Edits of player display messages"
+)
+display_edit_seconds = registry.histogram(
+    "lava_display_edit_seconds", "Latency of player display message edits"
+)
+inter_track_gap_seconds = registry.histogram(
+    "lava_inter_track_gap_seconds",
+    "Time from a track ending or another one being requested until the next track starts", ("prefetched",)
+)
+source_load_seconds = registry.histogram(
+    "lava_source_load_seconds", "Latency of loading items from local sources", ("source",)
+)
+
+
+@lru_cache(maxsize=1)
+def version_info() -> Tuple[str, str, Optional[str]]:
+    """
+    Get the version of the running code, this only runs git once per process.
+    :return: The commit hash, the branch and the upstream url of the branch.
+    """
+    branch = get_current_branch()
+
+    return get_commit_hash(), branch, get_upstream_url(branch)
+
+
+class SystemSampler:
+    """
+    Samples system CPU and memory usage, reusing a sample for a while so frequent readers don't hammer psutil.
+    """
+
+    def __init__(self, ttl: float = 5.0):
+        """
+        :param ttl: How many seconds a sample is reused for.
+        """
+        self.ttl = ttl
+
+        self._sampled_at: float = 0.0
+        self._cpu_percent: float = 0.0
+        self._memory = None
+
+    def _sample(self) -> None:
+        if monotonic() - self._sampled_at < self.ttl and self._memory is not None:
+            return
+
+        self._cpu_percent = cpu_percent()
+        self._memory = virtual_memory()
+        self._sampled_at = monotonic()
+
+    @property
+    def cpu_percent(self) -> float:
+        self._sample()
+
+        return self._cpu_percent
+
+    @property
+    def memory(self):
+        """
+        The psutil virtual memory sample.
+        """
+        self._sample()
+
+        return self._memory
+
+
+system_sampler = SystemSampler()
+
+system_cpu_percent = registry.gauge("lava_system_cpu_percent", "System-wide CPU usage")
+system_cpu_percent.set_function(lambda: {(): system_sampler.cpu_percent})
+
+system_memory_used_bytes = registry.gauge("lava_system_memory_used_bytes", "System-wide used memory")
+system_memory_used_bytes.set_function(lambda: {(): system_sampler.memory.used})
+
+
+class LoopLagMonitor:
+    """
+    Measures event loop lag by checking how late a periodic sleep wakes up.
+    """
+
+    def __init__(self, interval: float = 0.5, window: int = 20):
+        """
+        :param interval: How many seconds to sleep between measurements.
+        :param window: The amount of recent measurements the reported lag is the max of.
+        """
+        self.interval = interval
+
+        self.samples: Deque[float] = deque(maxlen=window)
+
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def lag(self) -> float:
+        """
+        The worst lag in seconds over the recent measurements.
+        """
+        return max(self.samples, default=0.0)
+
+    async def _measure(self) -> None:
+        while True:
+            start = monotonic()
+
+            await asyncio.sleep(self.interval)
+
+            lag = max(0.0, monotonic() - start - self.interval)
+
+            self.samples.append(lag)
+            event_loop_lag_seconds.observe(lag)
+
+    def start(self) -> None:
+        if not self._task or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._measure())
+
+    def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+
+event_loop_lag_seconds = registry.histogram(
+    "lava_event_loop_lag_seconds", "How late the event loop wakes up from a periodic sleep",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+
+loop_lag_monitor = LoopLagMonitor()
+
+
+class MetricsServer:
+    """
+    A small HTTP server exposing the metrics registry at /metrics.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 9100, metrics_registry: MetricsRegistry = registry):
+        self.host = host
+        self.port = port
+        self.registry = metrics_registry
+
+        self.runner: Optional[web.AppRunner] = None
+
+        self.logger = getLogger("lava.metrics")
+
+    async def handle_metrics(self, _: web.Request) -> web.Response:
+        return web.Response(text=self.registry.render(), content_type="text/plain", charset="utf-8")
+
+    async def start(self) -> None:
+        if self.runner:
+            return
+
+        app = web.Application()
+        app.router.add_get("/metrics", self.handle_metrics)
+
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+
+        await web.TCPSite(self.runner, self.host, self.port).start()
+
+        self.logger.info("Serving metrics on http://%s:%d/metrics", self.host, self.port)
+
+    async def stop(self) -> None:
+        if self.runner:
+            await self.runner.cleanup()
+            self.runner = None
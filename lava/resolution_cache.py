@@ -0,0 +1,116 @@
+import asyncio
+import sqlite3
+from logging import getLogger
+from os import makedirs
+from os.path import dirname
+from threading import Lock
+from time import time
+from typing import Optional, Union
+
+from lava.cache import TTLCache, MISSING
+
+
+class ResolutionCache:
+    """
+    A two-tier cache mapping an external track ID, e.g. a Spotify track ID, to the encoded Lavalink track it
+    resolved to. Lookups go to an in-memory LRU first, then to an SQLite database in WAL mode which survives restarts.
+    Failed resolutions are cached too, as None, for a shorter time.
+    """
+
+    def __init__(self, path: Optional[str], maxsize: int = 4096,
+                 ttl: float = 7 * 24 * 60 * 60, negative_ttl: float = 60 * 60):
+        """
+        :param path: The path of the SQLite database, None to only cache in memory.
+        :param maxsize: The max amount of entries kept in memory.
+        :param ttl: How many seconds a resolved track stays valid.
+        :param negative_ttl: How many seconds a failed resolution stays cached.
+        """
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+
+        self.memory: TTLCache[str, Optional[str]] = TTLCache(maxsize, ttl)
+
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock = Lock()
+
+        self.logger = getLogger("lava.resolution_cache")
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        if self._connection is None and self.path:
+            if dirname(self.path):
+                makedirs(dirname(self.path), exist_ok=True)
+
+            self._connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS resolutions "
+                "(key TEXT PRIMARY KEY, track TEXT, expires_at REAL NOT NULL)"
+            )
+            self._connection.execute("DELETE FROM resolutions WHERE expires_at <= ?", (time(),))
+
+        return self._connection
+
+    def _execute(self, sql: str, parameters: tuple = ()) -> list:
+        with self._lock:
+            if not (connection := self._connect()):
+                return []
+
+            return connection.execute(sql, parameters).fetchall()
+
+    async def _run(self, sql: str, parameters: tuple = ()) -> list:
+        try:
+            return await asyncio.to_thread(self._execute, sql, parameters)
+        except sqlite3.Error:
+            self.logger.exception("Failed to access the resolution cache at %s", self.path)
+            return []
+
+    async def get(self, key: str) -> Union[Optional[str], object]:
+        """
+        Get the encoded track a key resolved to.
+        :param key: The key, e.g. a Spotify track ID.
+        :return: The encoded track, None if resolving it failed recently, or MISSING if it's not cached.
+        """
+        if (track := self.memory.get(key, MISSING)) is not MISSING:
+            return track
+
+        rows = await self._run("SELECT track, expires_at FROM resolutions WHERE key = ?", (key,))
+
+        if not rows or rows[0][1] <= time():
+            return MISSING
+
+        track, expires_at = rows[0]
+
+        self.memory.set(key, track, ttl=expires_at - time())
+
+        return track
+
+    async def set(self, key: str, track: Optional[str]) -> None:
+        """
+        Cache what a key resolved to.
+        :param key: The key, e.g. a Spotify track ID.
+        :param track: The encoded track, None if resolving it failed.
+        """
+        ttl = self.ttl if track is not None else self.negative_ttl
+
+        self.memory.set(key, track, ttl=ttl)
+
+        await self._run(
+            "INSERT OR REPLACE INTO resolutions (key, track, expires_at) VALUES (?, ?, ?)", (key, track, time() + ttl)
+        )
+
+    async def invalidate(self, key: str) -> None:
+        """
+        Forget what a key resolved to, e.g. because the resolved track failed to play.
+        :param key: The key, e.g. a Spotify track ID.
+        """
+        self.memory.delete(key)
+
+        await self._run("DELETE FROM resolutions WHERE key = ?", (key,))
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection:
+                self._connection.close()
+                self._connection = None
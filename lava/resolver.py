@@ -0,0 +1,144 @@
+import asyncio
+from logging import getLogger
+from typing import TYPE_CHECKING, Optional, Sequence, Tuple, Dict, Awaitable, Callable, Any
+
+from lavalink import LoadResult, LoadType, AudioTrack, Node
+
+from lava.cache import MISSING
+from lava.metrics import resolver_wins
+
+if TYPE_CHECKING:
+    from lava.classes.lavalink_client import LavalinkClient
+
+Resolution = Tuple[LoadResult, AudioTrack]
+
+
+class RacingResolver:
+    """
+    Resolves a query on several backends at once, e.g. YouTube, YouTube Music and SoundCloud searches plus the local
+    sources, and takes the first acceptable result, cancelling the rest.
+    With a target duration, a result is acceptable when one of its top tracks is close enough to it, otherwise the
+    closest track among all results is taken once every backend answered.
+    """
+    SEARCH_BACKENDS = ("ytsearch", "ytmsearch", "scsearch")
+
+    def __init__(self, client: "LavalinkClient", timeout: float = 10.0, local_delay: float = 0.25,
+                 candidates_per_result: int = 5):
+        """
+        :param client: The Lavalink client.
+        :param timeout: How many seconds to wait for the backends at most.
+        :param local_delay: How many seconds the local sources wait before starting, unless a backend fails before
+                            that. They are slower and often redundant with Lavalink, so they're only a hedge.
+        :param candidates_per_result: How many of the top tracks of each result are scored.
+        """
+        self.client = client
+        self.timeout = timeout
+        self.local_delay = local_delay
+        self.candidates_per_result = candidates_per_result
+
+        self.logger = getLogger("lava.resolver")
+
+    @staticmethod
+    def tolerance(duration: int) -> int:
+        """
+        How far off the duration of a track may be, in milliseconds, to be accepted right away.
+        """
+        return max(3000, duration // 20)
+
+    def pick(self, result: LoadResult, duration: Optional[int]) -> Tuple[AudioTrack, int]:
+        """
+        Pick the track of a result closest to a duration.
+        :return: The track and how far its duration is off, in milliseconds.
+        """
+        if duration is None:
+            return result.tracks[0], 0
+
+        return min(
+            ((track, abs(track.duration - duration)) for track in result.tracks[:self.candidates_per_result]),
+            key=lambda candidate: candidate[1]
+        )
+
+    async def _hedged(self, load: Callable[[], Awaitable[LoadResult]], hurry: asyncio.Event) -> LoadResult:
+        try:
+            await asyncio.wait_for(hurry.wait(), self.local_delay)
+        except asyncio.TimeoutError:
+            pass
+
+        return await load()
+
+    async def resolve(self, query: str, backends: Sequence[Optional[str]] = SEARCH_BACKENDS,
+                      duration: Optional[int] = None, include_local: bool = False,
+                      node: Optional[Node] = None, timeout: Any = MISSING) -> Optional[Resolution]:
+        """
+        Resolve a query on several backends concurrently.
+        :param query: The query, without a search prefix.
+        :param backends: The search prefixes to query Lavalink with, None to query it with the query as is.
+        :param duration: The duration in milliseconds the track should have, None to accept any track.
+        :param include_local: Whether to also query the local sources.
+        :param node: The node to query, None for any node.
+        :param timeout: How many seconds to wait for the backends at most, defaults to the timeout of the resolver.
+                        None to wait for every backend, e.g. when the caller bounds the resolution itself.
+        :return: The result and the picked track, None if no backend found anything.
+        """
+        loop = asyncio.get_running_loop()
+        hurry = asyncio.Event()
+
+        tasks: Dict[asyncio.Task, str] = {
+            loop.create_task(
+                self.client.get_tracks(f"{backend}:{query}" if backend else query, node=node)
+            ): backend or "direct"
+            for backend in backends
+        }
+
+        if include_local:
+            tasks[loop.create_task(self._hedged(lambda: self.client.get_local_tracks(query), hurry))] = "local"
+
+        order = list(tasks)
+        pending = set(tasks)
+        best: Optional[Tuple[int, LoadResult, AudioTrack, str]] = None
+
+        if timeout is MISSING:
+            timeout = self.timeout
+
+        deadline = loop.time() + timeout if timeout is not None else None
+
+        try:
+            while pending:
+                remaining = deadline - loop.time() if deadline is not None else None
+
+                if remaining is not None and remaining <= 0:
+                    break
+
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+
+                for task in sorted(done, key=order.index):
+                    if task.exception():
+                        self.logger.debug("Backend %s failed to resolve %s", tasks[task], query,
+                                          exc_info=task.exception())
+
+                    result = None if task.exception() else task.result()
+
+                    if not result or result.load_type in (LoadType.ERROR, LoadType.EMPTY) or not result.tracks:
+                        hurry.set()
+                        continue
+
+                    track, off_by = self.pick(result, duration)
+
+                    if duration is None or off_by <= self.tolerance(duration):
+                        resolver_wins.inc(backend=tasks[task])
+                        return result, track
+
+                    hurry.set()
+
+                    if best is None or off_by < best[0]:
+                        best = (off_by, result, track, tasks[task])
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        if best is None:
+            return None
+
+        resolver_wins.inc(backend=best[3])
+
+        return best[1], best[2]
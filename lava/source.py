@@ -1,27 +1,56 @@
 import re
+from functools import partial
 from logging import getLogger
 from os import getenv
-from typing import Union, Tuple, Optional
+from typing import Union, Tuple, Optional, List, Type, Dict
+from urllib.parse import parse_qs, urlsplit, unquote
 
 from lavalink import Source, Client, LoadResult, LoadType, PlaylistInfo, DeferredAudioTrack
-from spotipy import Spotify, SpotifyClientCredentials
-from yt_dlp import YoutubeDL
-from yt_dlp.utils import UnsupportedError, DownloadError
 
-from lava.errors import LoadError
+from lava.bilibili import BilibiliClient
+from lava.classes.playlist_ingestion import PlaylistIngestion, PartialLoadResult
+from lava.cache import MISSING
+from lava.errors import LoadError, BilibiliError
+from lava.extraction import Extractor
+from lava.media_probe import MediaProbe
+from lava.metrics import source_load_seconds
+from lava.resolution_cache import ResolutionCache
+from lava.spotify import SpotifyClient, TrackBatcher
+
+
+ANY_HOST = "*"
+
+HOST_RX = re.compile(r'^https?://(?:[^@/?#]*@)?([^:/?#]+)')
+
+source_registry: List[Type["BaseSource"]] = []
+
+
+def register_source(cls: Type["BaseSource"]) -> Type["BaseSource"]:
+    """
+    Register a source class to the SourceManager, it's only instantiated once a query is routed to it
+    """
+    source_registry.append(cls)
+
+    return cls
 
 
 class BaseSource:
+    # Sources with a higher priority are checked first
+    priority: int = 0
+
+    # The hosts of the urls this source may support, ANY_HOST for every url, None for keywords
+    hosts: Tuple[Optional[str], ...] = ()
+
     def __init__(self):
         """
         Inits the source
         :raise ValueError if the current state is not ok to use this source
         """
-        self.priority: int = 0
 
-    def check_query(self, query: str) -> bool:
+    @classmethod
+    def check_query(cls, query: str) -> bool:
         """
-        Check if an url or keyword is supported by this source
+        Check if an url or keyword is supported by this source, this is only called for queries routed to the source
         :return: Whether the query is supported
         """
         raise NotImplementedError
@@ -35,75 +64,175 @@ class BaseSource:
         """
         raise NotImplementedError
 
+    async def close(self) -> None:
+        """
+        Release the resources of the source, e.g. its HTTP sessions, when the bot shuts down
+        """
+
 
 class SpotifyAudioTrack(DeferredAudioTrack):
+    resolution_cache: Optional[ResolutionCache] = None
+
     def __init__(self, track, requester, **extra):
         super().__init__(track, requester, **extra)
 
         self.track = None
 
     async def load(self, client):  # skipcq: PYL-W0201
+        cache = self.resolution_cache
+
+        if cache and (cached := await cache.get(self.identifier)) is not MISSING:
+            if cached is None:
+                raise LoadError
+
+            self.track = cached
+
+            return cached
+
         getLogger('lava.sources').info("Loading spotify track %s...", self.title)
 
-        result: LoadResult = await client.get_tracks(
-            f'ytsearch:{self.title} {self.author}'
-        )
+        resolution = await client.resolver.resolve(f'{self.title} {self.author}', duration=self.duration)
+
+        if resolution is None:
+            if cache:
+                await cache.set(self.identifier, None)
 
-        if result.load_type != LoadType.SEARCH or not result.tracks:
             raise LoadError
 
-        first_track = result.tracks[0]
-        base64 = first_track.track
+        _, resolved_track = resolution
+        base64 = resolved_track.track
         self.track = base64
 
+        if cache:
+            await cache.set(self.identifier, base64)
+
         getLogger('lava.sources').info("Loaded spotify track %s", self.title)
 
         return base64
 
+    async def invalidate_resolution(self) -> None:
+        """
+        Forget the cached resolution of this track, e.g. because it failed to play.
+        """
+        self.track = None
+
+        if self.resolution_cache:
+            await self.resolution_cache.invalidate(self.identifier)
+
 
+@register_source
 class SpotifySource(BaseSource):
+    priority = 5
+    hosts = ("open.spotify.com",)
+
+    url_rx = re.compile(r'^(https://open\.spotify\.com/)(track|album|playlist)/([a-zA-Z0-9]+)(.*)$')
+    track_url_rx = re.compile(r'https?:\/\/open\.spotify\.com\/track\/(\w+)')
+    playlist_url_rx = re.compile(r'https?:\/\/open\.spotify\.com\/playlist\/(\w+)')
+    album_url_rx = re.compile(r'https?:\/\/open\.spotify\.com\/album\/(\w+)')
+
     def __init__(self):
         super().__init__()
 
-        self.priority = 5
-
         spotify_client_id = getenv("SPOTIFY_CLIENT_ID")
         spotify_client_secret = getenv("SPOTIFY_CLIENT_SECRET")
 
-        credentials = SpotifyClientCredentials(
-            client_id=spotify_client_id,
-            client_secret=spotify_client_secret
+        if not spotify_client_id or not spotify_client_secret:
+            raise ValueError("SPOTIFY_CLIENT_ID and SPOTIFY_CLIENT_SECRET must be set to use Spotify")
+
+        self.spotify_client = SpotifyClient(
+            spotify_client_id, spotify_client_secret,
+            requests_per_second=float(getenv("SPOTIFY_REQUESTS_PER_SECOND", "10"))
         )
 
-        self.spotify_client = Spotify(auth_manager=credentials)
+        self.track_batcher = TrackBatcher(
+            self.spotify_client, window=float(getenv("SPOTIFY_BATCH_WINDOW_MS", "50")) / 1000
+        )
 
-    def check_query(self, query: str) -> bool:
-        spotify_url_rx = r'^(https://open\.spotify\.com/)(track|album|playlist)/([a-zA-Z0-9]+)(.*)$'
+        self.page_concurrency = int(getenv("SPOTIFY_PAGE_CONCURRENCY", "4"))
 
-        if re.match(spotify_url_rx, query):
-            return True
+        SpotifyAudioTrack.resolution_cache = ResolutionCache(
+            getenv("SPOTIFY_RESOLUTION_CACHE_PATH", "data/spotify_resolutions.sqlite3") or None
+        )
+
+    @classmethod
+    def check_query(cls, query: str) -> bool:
+        return cls.url_rx.match(query) is not None
+
+    async def close(self) -> None:
+        await self.spotify_client.close()
 
-        return False
+        if SpotifyAudioTrack.resolution_cache:
+            SpotifyAudioTrack.resolution_cache.close()
 
     async def load_item(self, client: Client, query: str):
-        track = self.__load_track(query)
+        track = await self.__load_track(query)
 
         if track:
             return LoadResult(LoadType.TRACK, [track], PlaylistInfo.none())
 
-        playlist, playlist_info = self.__load_playlist(query)
+        playlist, playlist_info, ingestion = await self.__load_playlist(query)
 
         if playlist:
+            if ingestion:
+                return PartialLoadResult(playlist, playlist_info, ingestion)
+
             return LoadResult(LoadType.PLAYLIST, playlist, playlist_info)
 
-        album, playlist_info = self.__load_album(query)
+        album, playlist_info, ingestion = await self.__load_album(query)
 
         if album:
+            if ingestion:
+                return PartialLoadResult(album, playlist_info, ingestion)
+
             return LoadResult(LoadType.PLAYLIST, album, playlist_info)
 
         return None
 
-    def __load_track(self, url: str) -> Union[SpotifyAudioTrack, None]:
+    @staticmethod
+    def __build_track(track: dict, artwork_url: Optional[str]) -> Optional[SpotifyAudioTrack]:
+        """
+        Build a SpotifyAudioTrack from a Spotify track object
+        :param track: Spotify track object
+        :param artwork_url: The artwork url of the track
+        :return: SpotifyAudioTrack, None if the track isn't playable, e.g. a local file or a removed track
+        """
+        if not track or not track.get('id'):
+            return None
+
+        return SpotifyAudioTrack(
+            {
+                'identifier': track['id'],
+                'isSeekable': True,
+                'author': ', '.join([artist['name'] for artist in track['artists']]),
+                'length': track['duration_ms'],
+                'isStream': False,
+                'title': track['name'],
+                'uri': f"https://open.spotify.com/track/{track['id']}",
+                'artworkUrl': artwork_url
+            },
+            requester=0
+        )
+
+    def __build_playlist_tracks(self, items: list) -> list[SpotifyAudioTrack]:
+        tracks = []
+
+        for item in items:
+            track = item.get('track')
+
+            if not track:
+                continue
+
+            images = track.get('album', {}).get('images')
+
+            if built := self.__build_track(track, images[0]['url'] if images else None):
+                tracks.append(built)
+
+        return tracks
+
+    def __build_album_tracks(self, items: list, artwork_url: Optional[str]) -> list[SpotifyAudioTrack]:
+        return [built for track in items if (built := self.__build_track(track, artwork_url))]
+
+    async def __load_track(self, url: str) -> Union[SpotifyAudioTrack, None]:
         """
         Get a track with given url from spotify, None if not found
         :param url: Spotify track url
@@ -114,144 +243,131 @@ class SpotifySource(BaseSource):
         if not track_id:
             return None
 
-        track = self.spotify_client.track(track_id)
+        track = await self.track_batcher.track(track_id)
 
         if track:
-            return SpotifyAudioTrack(
-                {
-                    'identifier': track['id'],
-                    'isSeekable': True,
-                    'author': ', '.join([artist['name'] for artist in track['artists']]),
-                    'length': track['duration_ms'],
-                    'isStream': False,
-                    'title': track['name'],
-                    'uri': f"https://open.spotify.com/track/{track['id']}",
-                    'artworkUrl': track['album']['images'][0]['url']
-                },
-                requester=0
-            )
+            images = track['album'].get('images')
+
+            return self.__build_track(track, images[0]['url'] if images else None)
+
         return None
 
-    def __load_playlist(self, url: str) -> Tuple[list[SpotifyAudioTrack], Union[PlaylistInfo, None]]:
+    async def __load_playlist(self, url: str) \
+            -> Tuple[list[SpotifyAudioTrack], Union[PlaylistInfo, None], Optional[PlaylistIngestion]]:
         """
-        Get tracks in a playlist with given url from spotify, None if not found
+        Get the first page of tracks in a playlist with given url from spotify, empty if not found
         :param url: Spotify playlist url
-        :return: list[SpotifyAudioTrack], PlaylistInfo
+        :return: list[SpotifyAudioTrack], PlaylistInfo, the ingestion of the remaining pages if there are any
         """
         playlist_id = self.__get_playlist_id_from_url(url)
 
         if not playlist_id:
-            return [], None
+            return [], None, None
 
-        playlist = self.spotify_client.playlist(playlist_id)
+        playlist = await self.spotify_client.playlist(playlist_id)
 
-        playlist_info = PlaylistInfo(playlist['name'], -1)
+        if not playlist:
+            return [], None, None
 
-        if playlist:
-            tracks = []
-
-            for track in playlist['tracks']['items']:
-                tracks.append(
-                    SpotifyAudioTrack(
-                        {
-                            'identifier': track['track']['id'],
-                            'isSeekable': True,
-                            'author': ', '.join([artist['name'] for artist in track['track']['artists']]),
-                            'length': track['track']['duration_ms'],
-                            'isStream': False,
-                            'title': track['track']['name'],
-                            'uri': f"https://open.spotify.com/track/{track['track']['id']}",
-                            'artworkUrl': track['track']['album']['images'][0]['url']
-                            if track['track']['album'].get('images') else None
-                        },
-                        requester=0
-                    )
-                )
-
-            return tracks, playlist_info
-        return [], None
-
-    def __load_album(self, url: str) -> Tuple[list[SpotifyAudioTrack], Union[PlaylistInfo, None]]:
-        """
-        Get tracks on an album with given url from spotify, None if not found
+        page = playlist['tracks']
+
+        async def load_page(offset: int) -> list[SpotifyAudioTrack]:
+            response = await self.spotify_client.playlist_tracks(playlist_id, offset, page['limit'])
+
+            return self.__build_playlist_tracks(response['items']) if response else []
+
+        return (
+            self.__build_playlist_tracks(page['items']),
+            PlaylistInfo(playlist['name'], -1),
+            self.__ingest_remaining(playlist['name'], page, load_page)
+        )
+
+    async def __load_album(self, url: str) \
+            -> Tuple[list[SpotifyAudioTrack], Union[PlaylistInfo, None], Optional[PlaylistIngestion]]:
+        """
+        Get the first page of tracks on an album with given url from spotify, empty if not found
         :param url: Spotify album url
-        :return: list[SpotifyAudioTrack], PlaylistInfo
+        :return: list[SpotifyAudioTrack], PlaylistInfo, the ingestion of the remaining pages if there are any
         """
         album_id = self.__get_album_id_from_url(url)
 
         if not album_id:
-            return [], None
+            return [], None, None
 
-        album = self.spotify_client.album(album_id)
+        album = await self.spotify_client.album(album_id)
 
-        playlist_info = PlaylistInfo(album['name'], -1)
+        if not album:
+            return [], None, None
 
-        if album:
-            tracks = []
-
-            for track in album['tracks']['items']:
-                tracks.append(
-                    SpotifyAudioTrack(
-                        {
-                            'identifier': track['id'],
-                            'isSeekable': True,
-                            'author': ', '.join([artist['name'] for artist in track['artists']]),
-                            'length': track['duration_ms'],
-                            'isStream': False,
-                            'title': track['name'],
-                            'uri': f"https://open.spotify.com/track/{track['id']}",
-                            'artworkUrl': album['images'][0]['url'] if album.get('images') else None
-                        },
-                        requester=0
-                    )
-                )
-
-            return tracks, playlist_info
-
-        return [], None
+        page = album['tracks']
+        artwork_url = album['images'][0]['url'] if album.get('images') else None
 
-    @staticmethod
-    def __get_track_id_from_url(url: str) -> Union[str, None]:
+        async def load_page(offset: int) -> list[SpotifyAudioTrack]:
+            response = await self.spotify_client.album_tracks(album_id, offset, page['limit'])
+
+            return self.__build_album_tracks(response['items'], artwork_url) if response else []
+
+        return (
+            self.__build_album_tracks(page['items'], artwork_url),
+            PlaylistInfo(album['name'], -1),
+            self.__ingest_remaining(album['name'], page, load_page)
+        )
+
+    def __ingest_remaining(self, name: str, page: dict, load_page) -> Optional[PlaylistIngestion]:
+        """
+        Plan the loading of the pages after the first one
+        :param name: The name of the playlist
+        :param page: The first page of tracks, a Spotify paging object
+        :param load_page: A function loading the page at an offset
+        :return: PlaylistIngestion, None if everything is on the first page
+        """
+        first_page_size = len(page['items'])
+
+        if page['total'] <= first_page_size:
+            return None
+
+        return PlaylistIngestion(
+            name, page['total'], first_page_size,
+            [partial(load_page, offset) for offset in range(first_page_size, page['total'], page['limit'])],
+            concurrency=self.page_concurrency
+        )
+
+    @classmethod
+    def __get_track_id_from_url(cls, url: str) -> Union[str, None]:
         """
         Get track id from url
         :param url: Spotify track url
         :return: Track id, None if not a track url
         """
-        track_url_rx = re.compile(r'https?:\/\/open\.spotify\.com\/track\/(\w+)')
-
-        match = track_url_rx.match(url)
+        match = cls.track_url_rx.match(url)
 
         if match:
             return match.group(1)
 
         return None
 
-    @staticmethod
-    def __get_playlist_id_from_url(url: str) -> Union[str, None]:
+    @classmethod
+    def __get_playlist_id_from_url(cls, url: str) -> Union[str, None]:
         """
         Get playlist id from url
         :param url: Spotify playlist url
         :return: Playlist id, None if not a playlist url
         """
-        playlist_url_rx = re.compile(r'https?:\/\/open\.spotify\.com\/playlist\/(\w+)')
-
-        match = playlist_url_rx.match(url)
+        match = cls.playlist_url_rx.match(url)
 
         if match:
             return match.group(1)
 
         return None
 
-    @staticmethod
-    def __get_album_id_from_url(url: str) -> Union[str, None]:
+    @classmethod
+    def __get_album_id_from_url(cls, url: str) -> Union[str, None]:
         """
         Get album id from url
         :param url: Spotify album url
         :return: Album id, None if not a album url
         """
-        album_url_rx = re.compile(r'https?:\/\/open\.spotify\.com\/album\/(\w+)')
-
-        match = album_url_rx.match(url)
+        match = cls.album_url_rx.match(url)
 
         if match:
             return match.group(1)
@@ -259,129 +375,102 @@ class SpotifySource(BaseSource):
         return None
 
 
-# class BilibiliSource(BaseSource):
-#     def __init__(self):
-#         super().__init__()
-#
-#         self.priority = 5
-#
-#     def check_query(self, query: str) -> bool:
-#         return query.startswith('https://www.bilibili.com/video/') or query.startswith('https://b23.tv/')
-#
-#     async def load_item(self, client: Client, query: str) -> Optional[LoadResult]:
-#         audio_url, title, author = self.get_audio(query)
-#
-#         track = (await client.get_tracks(audio_url, check_local=False)).tracks[0]
-#
-#         track.title = title
-#         track.author = f'{author} / [Bilibili]({query})'
-#
-#         return LoadResult(
-#             load_type=LoadType.TRACK,
-#             tracks=[track],
-#             playlist_info=None
-#         )
-#
-#     @staticmethod
-#     def get_video_info(bvid: str) -> Tuple[str, str]:
-#         """
-#         Gets video info from a Bilibili video bvid
-#
-#         :param bvid: Bilibili video bvid
-#         :return: Tuple of video cid, video session
-#         """
-#         headers = {
-#             'referer': 'https://www.bilibili.com/',
-#             'user-agent': 'Mozilla/5.0 (Windows NT 10.0; WOW64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/89.0.4389.114 Safari/537.36'
-#         }
-#         video_index_url = f"https://www.bilibili.com/video/{bvid}"
-#         resp = requests.get(video_index_url, headers=headers).text
-#         cid = re.findall('"cid":(\\d+),', resp)[0]
-#         session = re.findall('"session":"(.*?)"', resp)[0]
-#         return cid, session
-#
-#     def get_audio_url(self, url: str):
-#         """
-#         Gets audio URL from a Bilibili video URL
-#
-#         :param url: Bilibili video URL
-#         :return: audio URL
-#         """
-#         headers = {
-#             'referer': 'https://www.bilibili.com/',
-#             'user-agent': 'Mozilla/5.0 (Windows NT 10.0; WOW64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/89.0.4389.114 Safari/537.36'
-#         }
-#
-#         bvid = re.search(r"/video/([^/?]+)", url).group(1)
-#
-#         cid, session = self.get_video_info(bvid)
-#
-#         play_url = 'https://api.bilibili.com/x/player/playurl'
-#
-#         params = {
-#             'cid': cid,
-#             'qn': '2',
-#             'type': '',
-#             'otype': 'json',
-#             'fourk': '1',
-#             'bvid': bvid,
-#             'fnver': '0',
-#             'fnval': '976',
-#             'session': session,
-#         }
-#
-#         for _ in range(20):
-#             json_data = requests.get(url=play_url, params=params, headers=headers).json()
-#             audio_url = json_data['data']['dash']['audio'][0]['baseUrl']
-#             if audio_url.startswith("https://upos-hz-mirrorakam.akamaized.net/"):
-#                 return audio_url
-#
-#         return None
-#
-#     def get_audio(self, url: str) -> Tuple[str, str, str]:
-#         """
-#         Gets audio from a Bilibili video URL
-#
-#         :param url: Bilibili video URL
-#         :return: Tuple of audio URL, video title, video author.
-#         """
-#         headers = {
-#             'Connection': 'Keep-Alive',
-#             'Accept-Language': 'en-US,en;q=0.8,zh-Hans-CN;q=0.5,zh-Hans;q=0.3',
-#             'Accept': 'text/html, application/xhtml+xml, */*',
-#             'referer': 'https://www.bilibili.com',
-#             'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:99.0) Gecko/20100101 Firefox/99.0',
-#         }
-#
-#         video_html = requests.get(url, headers=headers)
-#
-#         values = video_html.text
-#
-#         text = BeautifulSoup(values, features='html.parser')
-#
-#         title = text.find('title').contents[0].replace(' ', ',').replace('/', ',')
-#
-#         author = text.select_one('div.up-detail-top a').text.replace("\n", "")
-#
-#         audio_url = self.get_audio_url(url)
-#
-#         return audio_url, title, author
+@register_source
+class BilibiliSource(BaseSource):
+    priority = 5
+    hosts = ("www.bilibili.com", "bilibili.com", "m.bilibili.com", "b23.tv")
 
+    video_url_rx = re.compile(r'^https?://(?:www\.|m\.)?bilibili\.com/video/(BV[0-9A-Za-z]{10})/?(?:\?([^#]*))?')
+    short_link_rx = re.compile(r'^https?://b23\.tv/[0-9A-Za-z]+/?$')
 
-class YTDLSource(BaseSource):
     def __init__(self):
         super().__init__()
 
-        self.priority = 0
+        self.bilibili_client = BilibiliClient()
+
+    @classmethod
+    def check_query(cls, query: str) -> bool:
+        return cls.video_url_rx.match(query) is not None or cls.short_link_rx.match(query) is not None
+
+    async def close(self) -> None:
+        await self.bilibili_client.close()
+
+    async def load_item(self, client: Client, query: str) -> Optional[LoadResult]:
+        url = query
+
+        if self.short_link_rx.match(url):
+            try:
+                url = await self.bilibili_client.expand_short_link(url)
+            except BilibiliError:
+                getLogger('lava.sources').exception("Failed to expand Bilibili short link %s", query)
+                return None
+
+            if not url:
+                return None
+
+        if not (match := self.video_url_rx.match(url)):
+            return None
+
+        bvid = match.group(1)
+
+        try:
+            page = int(parse_qs(match.group(2) or "").get("p", ["1"])[0])
+        except ValueError:
+            page = 1
+
+        try:
+            audio = await self.bilibili_client.resolve(bvid, page)
+        except BilibiliError:
+            getLogger('lava.sources').exception("Failed to resolve Bilibili video %s", bvid)
+            return None
+
+        if not audio:
+            return None
+
+        result = await client.get_tracks(audio.url)
+
+        if not result.tracks:  # The url stopped working before it expired, don't serve it again
+            self.bilibili_client.invalidate(bvid, page)
+            return None
 
-        self.ytdl = YoutubeDL(
-            {"format": "bestaudio"}
+        track = result.tracks[0]
+
+        track.title = audio.title
+        track.author = f'{audio.author} / [Bilibili](https://www.bilibili.com/video/{bvid}?p={page})'
+        track.artwork_url = audio.artwork_url
+
+        return LoadResult(
+            load_type=LoadType.TRACK,
+            tracks=[track],
+            playlist_info=PlaylistInfo.none()
         )
 
-    def check_query(self, query: str) -> bool:
-        youtube_url_rx = r"^(https?://(www\.)?(youtube\.com|music\.youtube\.com)/(watch\?v=|playlist\?list=)([a-zA-Z0-9_-]+))"
 
-        if re.match(youtube_url_rx, query):
+@register_source
+class YTDLSource(BaseSource):
+    priority = 0
+    hosts = (ANY_HOST,)
+
+    # Left to Lavalink, which loads these natively
+    youtube_url_rx = re.compile(
+        r"^(https?://(www\.)?(youtube\.com|music\.youtube\.com)/(watch\?v=|playlist\?list=)([a-zA-Z0-9_-]+))"
+    )
+    site_rx = re.compile(r'^(?:https?:\/\/)?(?:[^@\n]+@)?(?:www\.)?([^:\/\n]+)')
+
+    def __init__(self):
+        super().__init__()
+
+        self.extractor = Extractor(
+            {"format": "bestaudio", "quiet": True},
+            max_workers=int(getenv("YTDL_WORKERS", "2")),
+            timeout=float(getenv("YTDL_TIMEOUT", "20"))
+        )
+
+        self.media_probe = MediaProbe()
+
+    @classmethod
+    def check_query(cls, query: str) -> bool:
+        if cls.youtube_url_rx.match(query):
             return False
 
         if not ((query.startswith("http://")) or (query.startswith("https://"))):
@@ -389,23 +478,27 @@ class YTDLSource(BaseSource):
 
         return True
 
+    async def close(self) -> None:
+        self.extractor.close()
+
+        await self.media_probe.close()
+
     async def load_item(self, client: Client, query: str) -> Optional[LoadResult]:
-        try:
-            url_info = self.ytdl.extract_info(query, download=False)
+        if await self.media_probe.is_direct_media(query) and (result := await self.__load_direct(client, query)):
+            return result
 
-            if 'entries' in url_info:
-                url_info = url_info['entries'][0]
+        url_info = await self.extractor.extract(query)
 
-        except (UnsupportedError, DownloadError):
+        if not url_info:
             return None
 
         try:
-            track = (await client.get_tracks(url_info['formats'][-1]['url'])).tracks[0]
+            track = (await client.get_tracks(url_info['url'])).tracks[0]
 
         except IndexError:
             return None
 
-        match = re.match(r'^(?:https?:\/\/)?(?:[^@\n]+@)?(?:www\.)?([^:\/\n]+)', url_info['webpage_url'])
+        match = self.site_rx.match(url_info['webpage_url'])
 
         track.title = url_info['title']
         track.author = f"Unknown / [{match.group(1)}]({match.group(0)})"
@@ -416,41 +509,129 @@ class YTDLSource(BaseSource):
             playlist_info=PlaylistInfo.none()
         )
 
+    async def __load_direct(self, client: Client, url: str) -> Optional[LoadResult]:
+        """
+        Load direct media with Lavalink's HTTP source, without extracting it first
+        :param url: The url of the media
+        :return: The load result, None if Lavalink couldn't load it
+        """
+        result = await client.get_tracks(url)
+
+        if not result.tracks:
+            return None
+
+        track = result.tracks[0]
+        match = self.site_rx.match(url)
+
+        if not track.title or track.title == "Unknown title":  # Lavalink's placeholder for media without metadata
+            track.title = unquote(urlsplit(url).path.rsplit("/", 1)[-1]) or match.group(1)
+
+        track.author = f"Unknown / [{match.group(1)}]({match.group(0)})"
+
+        return LoadResult(
+            load_type=LoadType.TRACK,
+            tracks=[track],
+            playlist_info=PlaylistInfo.none()
+        )
+
 
 class SourceManager(Source):
-    def __init__(self):
+    def __init__(self, sources: Optional[List[Type[BaseSource]]] = None):
+        """
+        :param sources: The source classes to route queries to, defaults to every registered source
+        """
         super().__init__(name='LavaSourceManager')
 
-        self.sources: list[BaseSource] = []
+        self.source_classes: List[Type[BaseSource]] = sorted(
+            source_registry if sources is None else sources, key=lambda cls: cls.priority, reverse=True
+        )
+
+        # Host -> candidate sources in priority order, None is the key for keyword queries
+        self.routes: Dict[Optional[str], List[Type[BaseSource]]] = {}
+        self.any_host_routes: List[Type[BaseSource]] = []
+
+        self.instances: Dict[Type[BaseSource], Optional[BaseSource]] = {}
 
         self.logger = getLogger('lava.sources')
 
-        self.initial_sources()
+        self.build_routes()
+
+    def build_routes(self):
+        """
+        Build the host -> candidate sources index, a query is only checked against the sources routed to its host
+        """
+        self.any_host_routes = [cls for cls in self.source_classes if ANY_HOST in cls.hosts]
+
+        hosts = {host for cls in self.source_classes for host in cls.hosts if host != ANY_HOST}
 
-    def initial_sources(self):
-        self.logger.info('Initializing sources...')
+        self.routes = {
+            host: [
+                cls for cls in self.source_classes
+                if host in cls.hosts or (host is not None and ANY_HOST in cls.hosts)
+            ]
+            for host in hosts
+        }
 
-        for cls in BaseSource.__subclasses__():
-            self.logger.debug(f'Initializing {cls.__name__}...')
+        self.routes.setdefault(None, [])
 
-            self.sources.append(cls())
+    def route(self, query: str) -> List[Type[BaseSource]]:
+        """
+        Get the sources that may support a query, in priority order
+        :param query: The query
+        :return: The candidate source classes
+        """
+        if not (match := HOST_RX.match(query)):
+            return self.routes[None] if not query.startswith(("http://", "https://")) else []
+
+        return self.routes.get(match.group(1).lower(), self.any_host_routes)
 
-        self.sources.sort(key=lambda x: x.priority, reverse=True)
+    def get_source(self, cls: Type[BaseSource]) -> Optional[BaseSource]:
+        """
+        Get the instance of a source, instantiating it on first use
+        :param cls: The source class
+        :return: The source, None if it can't be used in the current state
+        """
+        if cls not in self.instances:
+            self.logger.info('Initializing %s...', cls.__name__)
+
+            try:
+                self.instances[cls] = cls()
+            except ValueError:
+                self.logger.exception('Failed to initialize %s, disabling it', cls.__name__)
+
+                self.instances[cls] = None
+
+        return self.instances[cls]
 
     async def load_item(self, client: Client, query: str) -> Optional[LoadResult]:
         self.logger.info("Received query: %s, checking in sources...", query)
 
-        for source in self.sources:
-            self.logger.debug("Checking source for query %s: %s", query, source.__class__.__name__)
+        for cls in self.route(query):
+            if not cls.check_query(query):
+                self.logger.debug("Source %s does not match query %s, skipping...", cls.__name__, query)
 
-            if not source.check_query(query):
-                self.logger.debug("Source %s does not match query %s, skipping...", source.__class__.__name__, query)
+                continue
 
+            if not (source := self.get_source(cls)):
                 continue
 
-            self.logger.info("Source %s matched query %s, loading...", source.__class__.__name__, query)
+            self.logger.info("Source %s matched query %s, loading...", cls.__name__, query)
 
-            return await source.load_item(client, query)
+            with source_load_seconds.time(source=cls.__name__):
+                return await source.load_item(client, query)
 
         self.logger.info("No sources matched query %s, returning None", query)
         return None
+
+    async def close(self) -> None:
+        """
+        Close every source that was initialized
+        """
+        for cls, source in self.instances.items():
+            if source is None:
+                continue
+
+            try:
+                await source.close()
+            except Exception:  # skipcq: PYL-W0703
+                self.logger.exception('Failed to close %s', cls.__name__)
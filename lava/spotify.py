@@ -0,0 +1,272 @@
+import asyncio
+import re
+from base64 import b64encode
+from email.utils import parsedate_to_datetime
+from logging import getLogger
+from math import isfinite
+from time import monotonic, time
+from typing import Optional, Dict, Any, List
+
+import aiohttp
+
+from lava.errors import SpotifyError
+from lava.http import LazySession
+
+
+def parse_retry_after(value: Optional[str], default: float = 1.0) -> float:
+    """
+    Parse a Retry-After header, which is either an amount of seconds or an HTTP date.
+    :param value: The value of the header.
+    :param default: The amount of seconds to use if the header is missing or malformed.
+    :return: How many seconds to wait.
+    """
+    if not value:
+        return default
+
+    try:
+        seconds = float(value)
+    except ValueError:
+        pass
+    else:
+        return max(0.0, seconds) if isfinite(seconds) else default
+
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time())
+    except (TypeError, ValueError, IndexError):
+        return default
+
+
+class RateLimiter:
+    """
+    Spaces calls out to a global budget of requests per second, and pauses everyone when the API asks us to back off.
+    """
+
+    def __init__(self, rate: float):
+        """
+        :param rate: The max amount of requests per second.
+        """
+        self.interval = 1 / rate
+
+        self._next_slot: float = 0.0
+        self._blocked_until: float = 0.0
+
+    def block(self, seconds: float) -> None:
+        """
+        Hold every call back for a while, e.g. when the API answers with 429 Retry-After.
+        :param seconds: How many seconds to hold the calls back for.
+        """
+        self._blocked_until = max(self._blocked_until, monotonic() + seconds)
+
+    async def acquire(self) -> None:
+        """
+        Wait for the next slot in the budget.
+        """
+        slot = max(monotonic(), self._next_slot, self._blocked_until)
+        self._next_slot = slot + self.interval
+
+        if (delay := slot - monotonic()) > 0:
+            await asyncio.sleep(delay)
+
+
+class SpotifyClient:
+    """
+    A minimal async Spotify Web API client using the client credentials flow,
+    sharing one pooled HTTP session and one access token across concurrent calls.
+    """
+    API_BASE = "https://api.spotify.com/v1"
+    TOKEN_URL = "https://accounts.spotify.com/api/token"
+
+    def __init__(self, client_id: str, client_secret: str,
+                 max_concurrency: int = 8, requests_per_second: float = 10.0, max_retries: int = 5):
+        """
+        :param client_id: The client ID of the Spotify application.
+        :param client_secret: The client secret of the Spotify application.
+        :param max_concurrency: The max amount of requests in flight at once.
+        :param requests_per_second: The global budget of requests per second.
+        :param max_retries: How many times a rate limited or failed request is retried.
+        """
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+
+        self.rate_limiter = RateLimiter(requests_per_second)
+
+        self.http = LazySession(limit=max_concurrency, timeout=aiohttp.ClientTimeout(total=15))
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+        self._token: Optional[str] = None
+        self._token_expires_at: float = 0.0
+        self._token_lock = asyncio.Lock()
+
+        self.logger = getLogger("lava.spotify")
+
+    async def _get_token(self) -> str:
+        """
+        Get an access token, concurrent callers share a single token request.
+        """
+        async with self._token_lock:
+            if self._token and monotonic() < self._token_expires_at:
+                return self._token
+
+            credentials = b64encode(f"{self.client_id}:{self.client_secret}".encode()).decode()
+
+            async with self.http.session.post(
+                    self.TOKEN_URL,
+                    data={"grant_type": "client_credentials"},
+                    headers={"Authorization": f"Basic {credentials}"}
+            ) as response:
+                if response.status != 200:
+                    raise SpotifyError(f"Failed to get Spotify access token: {response.status}")
+
+                data = await response.json()
+
+            self._token = data['access_token']
+            self._token_expires_at = monotonic() + data['expires_in'] - 60
+
+            return self._token
+
+    async def request(self, path: str, params: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Make a GET request to the Spotify Web API, honouring Retry-After when rate limited.
+        :param path: The path of the endpoint, e.g. "/tracks/{id}".
+        :param params: The query parameters.
+        :return: The JSON response, None if the item was not found.
+        :raise SpotifyError: If the request keeps failing.
+        """
+        url = path if path.startswith("https://") else f"{self.API_BASE}{path}"
+
+        for _ in range(self.max_retries + 1):
+            token = await self._get_token()
+
+            await self.rate_limiter.acquire()
+
+            async with self._semaphore, self.http.session.get(
+                    url, params=params, headers={"Authorization": f"Bearer {token}"}
+            ) as response:
+                if response.status == 200:
+                    return await response.json()
+
+                if response.status in (400, 404):
+                    return None
+
+                if response.status == 401:  # The token expired early, get a new one
+                    self._token = None
+                    continue
+
+                if response.status == 429 or response.status >= 500:
+                    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+
+                    self.logger.warning("Spotify API answered %d, retrying in %s seconds", response.status, retry_after)
+
+                    self.rate_limiter.block(retry_after)
+                    continue
+
+                raise SpotifyError(f"Spotify API answered {response.status} for {path}")
+
+        raise SpotifyError(f"Spotify API request to {path} kept failing")
+
+    async def track(self, track_id: str) -> Optional[Dict[str, Any]]:
+        return await self.request(f"/tracks/{track_id}")
+
+    async def tracks(self, track_ids: List[str]) -> Optional[Dict[str, Any]]:
+        """
+        Get up to 50 tracks in one request.
+        :param track_ids: The IDs of the tracks.
+        :return: The response, whose "tracks" holds the tracks in the same order, None for unknown IDs.
+        """
+        return await self.request("/tracks", {"ids": ",".join(track_ids)})
+
+    async def playlist(self, playlist_id: str) -> Optional[Dict[str, Any]]:
+        return await self.request(f"/playlists/{playlist_id}", {"additional_types": "track"})
+
+    async def playlist_tracks(self, playlist_id: str, offset: int, limit: int = 100) -> Optional[Dict[str, Any]]:
+        return await self.request(
+            f"/playlists/{playlist_id}/tracks", {"offset": offset, "limit": limit, "additional_types": "track"}
+        )
+
+    async def album(self, album_id: str) -> Optional[Dict[str, Any]]:
+        return await self.request(f"/albums/{album_id}")
+
+    async def album_tracks(self, album_id: str, offset: int, limit: int = 50) -> Optional[Dict[str, Any]]:
+        return await self.request(f"/albums/{album_id}/tracks", {"offset": offset, "limit": limit})
+
+    async def close(self) -> None:
+        await self.http.close()
+
+
+class TrackBatcher:
+    """
+    Collects the track lookups made within a short window and fetches them together through the multi-ID endpoint,
+    so pasting several links costs one API call instead of one per link.
+    """
+    MAX_BATCH_SIZE = 50
+
+    # Spotify IDs are 22 base62 characters, a malformed one would fail the whole batch
+    id_rx = re.compile(r'^[0-9A-Za-z]{22}$')
+
+    def __init__(self, client: SpotifyClient, window: float = 0.05):
+        """
+        :param client: The Spotify client.
+        :param window: How many seconds to wait for more lookups after the first one of a batch.
+        """
+        self.client = client
+        self.window = window
+
+        self.pending: Dict[str, List[asyncio.Future]] = {}
+
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+
+        self.logger = getLogger("lava.spotify")
+
+    async def track(self, track_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a track, batched with the other lookups of the current window.
+        :param track_id: The ID of the track.
+        :return: The track, None if it wasn't found.
+        """
+        if not self.id_rx.match(track_id):
+            return await self.client.track(track_id)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        self.pending.setdefault(track_id, []).append(future)
+
+        if len(self.pending) >= self.MAX_BATCH_SIZE:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window, self._flush)
+
+        return await future
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch, self.pending = self.pending, {}
+
+        if batch:
+            _ = asyncio.get_running_loop().create_task(self._fetch(batch))
+
+    async def _fetch(self, batch: Dict[str, List[asyncio.Future]]) -> None:
+        track_ids = list(batch)
+
+        try:
+            response = await self.client.tracks(track_ids)
+        except Exception as error:  # skipcq: PYL-W0703
+            for futures in batch.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(error)
+            return
+
+        tracks = response['tracks'] if response else [None] * len(track_ids)
+
+        self.logger.debug("Fetched %d tracks in one batch", len(track_ids))
+
+        for track_id, track in zip(track_ids, tracks):
+            for future in batch[track_id]:
+                if not future.done():
+                    future.set_result(track)
@@ -130,7 +130,9 @@ async def get_recommended_tracks(player: "LavaPlayer", track: AudioTrack, max_re
         if len(results) >= max_results:
             break
 
-        track = (await player.node.get_tracks(f"https://youtube.com/watch?v={result['id']}")).tracks[0]
+        track = (await player.client.get_tracks(
+            f"https://youtube.com/watch?v={result['id']}", node=player.node
+        )).tracks[0]
 
         results.append(track)
 
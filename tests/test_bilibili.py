@@ -0,0 +1,230 @@
+import asyncio
+import json
+import os
+import unittest
+from typing import Dict, Any, List, Tuple
+
+import aiohttp
+
+from lava.bilibili import BilibiliClient, audio_expiry
+from lava.errors import BilibiliError
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "bilibili")
+
+
+def fixture(name: str) -> Dict[str, Any]:
+    with open(os.path.join(FIXTURES, f"{name}.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+class FakeResponse:
+    def __init__(self, status: int = 200, body: Any = None, headers: Dict[str, str] = None):
+        self.status = status
+        self.body = body
+        self.headers = headers or {}
+
+    async def __aenter__(self) -> "FakeResponse":
+        return self
+
+    async def __aexit__(self, *_) -> None:
+        pass
+
+    async def json(self, content_type: Any = None) -> Any:
+        return self.body
+
+
+class FakeSession:
+    """
+    Answers the API paths it's given with fixtures, in place of the aiohttp session of the client.
+    """
+    closed = False
+
+    def __init__(self, responses: Dict[str, Any] = None, error: Exception = None):
+        self.responses = responses or {}
+        self.error = error
+
+        self.requests: List[Tuple[str, Dict[str, Any]]] = []
+
+    def _respond(self, url: str, params: Dict[str, Any] = None) -> FakeResponse:
+        self.requests.append((url, params or {}))
+
+        if self.error:
+            raise self.error
+
+        response = self.responses[url.removeprefix(BilibiliClient.API_BASE)]
+
+        return response if isinstance(response, FakeResponse) else FakeResponse(body=response)
+
+    def get(self, url: str, params: Dict[str, Any] = None) -> FakeResponse:
+        return self._respond(url, params)
+
+    def head(self, url: str, allow_redirects: bool = True) -> FakeResponse:
+        return self._respond(url)
+
+    async def close(self) -> None:
+        pass
+
+
+def client_with(session: FakeSession) -> BilibiliClient:
+    client = BilibiliClient()
+    client.http._session = session
+
+    return client
+
+
+class TestPickUrl(unittest.TestCase):
+    def setUp(self):
+        self.client = BilibiliClient()
+
+    def test_dash_prefers_mirror_of_best_stream(self):
+        url = self.client.pick_url(fixture("playurl_dash")['data'])
+
+        self.assertEqual(
+            url,
+            "https://upos-hz-mirrorakam.akamaized.net/upgcxcode/31/62/62131/62131-1-30280.m4s"
+            "?hdnts=exp%3D1700000000~hmac%3Dhigh"
+        )
+
+    def test_dash_falls_back_to_base_url(self):
+        url = self.client.pick_url(fixture("playurl_dash_no_mirror")['data'])
+
+        self.assertEqual(
+            url,
+            "https://upos-sz-mirrorcos.bilivideo.com/upgcxcode/87/97/279786/279786-1-30280.m4s?deadline=1700000000"
+        )
+
+    def test_durl(self):
+        url = self.client.pick_url(fixture("playurl_durl")['data'])
+
+        self.assertEqual(
+            url, "https://upos-sz-mirrorcos.bilivideo.com/upgcxcode/31/62/62131/62131-1-16.mp4?deadline=1700000000"
+        )
+
+    def test_no_streams(self):
+        self.assertIsNone(self.client.pick_url(fixture("playurl_empty")['data']))
+        self.assertIsNone(self.client.pick_url({}))
+
+
+class TestAudioExpiry(unittest.TestCase):
+    def test_upos_deadline(self):
+        self.assertEqual(audio_expiry(fixture("playurl_durl")['data']['durl'][0]['url']), 1700000000.0)
+
+    def test_akamai_token(self):
+        backup_urls = fixture("playurl_dash")['data']['dash']['audio'][0]['backupUrl']
+
+        self.assertEqual(audio_expiry(backup_urls[0]), 1700000000.0)
+
+    def test_unsigned(self):
+        self.assertIsNone(audio_expiry("https://example.com/audio.m4s"))
+
+
+class TestRequest(unittest.IsolatedAsyncioTestCase):
+    async def test_success(self):
+        client = client_with(FakeSession({"/x/web-interface/view": fixture("view_single")}))
+
+        data = await client.request("/x/web-interface/view", {"bvid": "BV1xx411c7mD"})
+
+        self.assertEqual(data['cid'], 62131)
+
+    async def test_not_found_codes(self):
+        for name in ("error_404", "error_400", "error_62002"):
+            with self.subTest(name):
+                client = client_with(FakeSession({"/x/web-interface/view": fixture(name)}))
+
+                self.assertIsNone(await client.request("/x/web-interface/view", {"bvid": "BV1xx411c7mD"}))
+
+    async def test_other_codes(self):
+        client = client_with(FakeSession({"/x/web-interface/view": fixture("error_412")}))
+
+        with self.assertRaises(BilibiliError):
+            await client.request("/x/web-interface/view", {"bvid": "BV1xx411c7mD"})
+
+    async def test_http_status(self):
+        client = client_with(FakeSession({"/x/web-interface/view": FakeResponse(status=503)}))
+
+        with self.assertRaises(BilibiliError):
+            await client.request("/x/web-interface/view", {"bvid": "BV1xx411c7mD"})
+
+    async def test_connection_errors(self):
+        for error in (aiohttp.ClientConnectionError(), asyncio.TimeoutError()):
+            with self.subTest(type(error).__name__):
+                client = client_with(FakeSession(error=error))
+
+                with self.assertRaises(BilibiliError):
+                    await client.request("/x/web-interface/view", {"bvid": "BV1xx411c7mD"})
+
+
+class TestExpandShortLink(unittest.IsolatedAsyncioTestCase):
+    async def test_redirect(self):
+        session = FakeSession({
+            "https://b23.tv/abc123": FakeResponse(
+                status=302, headers={"Location": "https://www.bilibili.com/video/BV1xx411c7mD?p=1"}
+            )
+        })
+        client = client_with(session)
+
+        for _ in range(2):
+            self.assertEqual(
+                await client.expand_short_link("https://b23.tv/abc123"),
+                "https://www.bilibili.com/video/BV1xx411c7mD?p=1"
+            )
+
+        self.assertEqual(len(session.requests), 1)
+
+    async def test_no_redirect(self):
+        client = client_with(FakeSession({"https://b23.tv/abc123": FakeResponse(status=404)}))
+
+        self.assertIsNone(await client.expand_short_link("https://b23.tv/abc123"))
+
+    async def test_connection_errors(self):
+        for error in (aiohttp.ClientConnectionError(), asyncio.TimeoutError()):
+            with self.subTest(type(error).__name__):
+                client = client_with(FakeSession(error=error))
+
+                with self.assertRaises(BilibiliError):
+                    await client.expand_short_link("https://b23.tv/abc123")
+
+
+class TestResolve(unittest.IsolatedAsyncioTestCase):
+    async def test_single_page(self):
+        client = client_with(FakeSession({
+            "/x/web-interface/view": fixture("view_single"),
+            "/x/player/playurl": fixture("playurl_dash")
+        }))
+
+        audio = await client.resolve("BV1xx411c7mD")
+
+        self.assertEqual(audio.title, "字幕君交流场所")
+        self.assertEqual(audio.author, "碧诗")
+        self.assertEqual(audio.duration, 2023 * 1000)
+
+    async def test_multi_page_titles(self):
+        session = FakeSession({
+            "/x/web-interface/view": fixture("view_multi"),
+            "/x/player/playurl": fixture("playurl_dash_no_mirror")
+        })
+        client = client_with(session)
+
+        first = await client.resolve("BV1Ps411h7pE", 1)
+        second = await client.resolve("BV1Ps411h7pE", 2)
+
+        self.assertEqual(first.title, "合集 - 第一集")
+        self.assertEqual(second.title, "合集 - 第二集")
+        self.assertEqual(second.cid, 279787)
+        self.assertEqual(second.duration, 240 * 1000)
+
+        self.assertEqual(session.requests[-1][1]['cid'], 279787)
+
+    async def test_missing_page(self):
+        client = client_with(FakeSession({"/x/web-interface/view": fixture("view_multi")}))
+
+        self.assertIsNone(await client.resolve("BV1Ps411h7pE", 3))
+
+    async def test_not_found(self):
+        client = client_with(FakeSession({"/x/web-interface/view": fixture("error_404")}))
+
+        self.assertIsNone(await client.resolve("BV1xx411c7mD"))
+
+
+if __name__ == "__main__":
+    unittest.main()